@@ -1,20 +1,36 @@
+import functools
 import importlib.metadata
 import inspect
 import logging
+import re
 import sys
+import weakref
+from collections.abc import Iterable
 from pathlib import Path
-from typing import Any, get_type_hints
+from typing import Any, Literal, get_type_hints
 
-from rich.console import Console
+from rich.console import Console, Group
 from rich.text import Text
 
 from ipython_playground.create import create_playground_file
 
-from . import extras
+from . import extras, lazy, namespace, sizing, timing
+from .namespace import KINDS, classify_namespace, diff_snapshots, take_snapshot
+from .table_sizes import model_tables
+from .table_sizes import table_sizes as estimate_table_sizes
 from .version import __version__ as __version__
 
+_signature_cache: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+"(code, signature, return type) per function or class, dropped when the object is garbage collected"
 
-def _format_signature(obj: Any) -> str:
+
+def _code_of(obj: Any):
+    "code object which changes when a function, or a class __init__, is redefined by a reload"
+    target = obj.__init__ if inspect.isclass(obj) else obj
+    return getattr(target, "__code__", None)
+
+
+def _describe_signature(obj: Any) -> tuple[str, str]:
     try:
         sig = str(inspect.signature(obj.__init__ if inspect.isclass(obj) else obj))
         if sig in (
@@ -24,14 +40,148 @@ def _format_signature(obj: Any) -> str:
             "(__pydantic_self__, **data: Any) -> None",
             "(__pydantic_self__, **data: 'Any') -> 'None'",
         ):
-            return ""
-        return sig
+            sig = ""
     except (TypeError, ValueError):
-        return ""
+        sig = ""
+
+    if not inspect.isfunction(obj):
+        return sig, ""
+
+    # get_type_hints evaluates forward references, which is the expensive part on pydantic & SQLModel heavy code
+    try:
+        return_type = get_type_hints(obj).get("return", None)
+    except NameError:
+        # This happens if the object was created with a class (like Engine) that was imported and used, but the
+        # symbol Engine is not present in the current module's namespace—maybe it was imported in another module,
+        # or imported and then deleted, or only referenced as a string in type hints. The object still has the
+        # correct type, but get_type_hints can't resolve the name unless Engine is available in the current globalns.
+        return_type = None
+
+    if not return_type:
+        return sig, ""
+    return sig, getattr(return_type, "__name__", str(return_type))
+
+
+def _cached_signature(obj: Any) -> tuple[str, str]:
+    code = _code_of(obj)
+
+    try:
+        cached = _signature_cache.get(obj)
+    except TypeError:
+        # not weak referenceable, nothing to cache against
+        return _describe_signature(obj)
+
+    if cached is not None and cached[0] is code:
+        return cached[1], cached[2]
+
+    sig, return_type = _describe_signature(obj)
+    _signature_cache[obj] = (code, sig, return_type)
+    return sig, return_type
+
+
+def _format_signature(obj: Any) -> str:
+    return _cached_signature(obj)[0]
+
+
+def _format_return_type(obj: Any) -> str:
+    "resolved return type name of a function, empty if there isn't one"
+    return _cached_signature(obj)[1]
+
+
+def _truncate_text(text: str, max_width: int) -> str:
+    if len(text) > max_width:
+        return text[: max_width - 3] + "..."
+    return text
+
+
+def _normalize_distribution_name(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+@functools.cache
+def _distribution_versions() -> dict[str, str]:
+    """Map top-level import names to the version of the distribution which provides them.
+
+    Built once per session: `importlib.metadata.version` scans every dist-info on sys.path on each call, which adds
+    up quickly in a large virtualenv. Call `_distribution_versions.cache_clear()` after installing packages.
+    """
 
+    versions: dict[str, str] = {}
+    for dist in importlib.metadata.distributions():
+        name = dist.metadata["Name"]
+        # like importlib.metadata.version, the first distribution on sys.path wins
+        if name:
+            versions.setdefault(_normalize_distribution_name(name), dist.version)
 
-def output():
-    """Display relevant custom functions and variables with minimal formatting"""
+    index: dict[str, str] = {}
+    for import_name, dist_names in importlib.metadata.packages_distributions().items():
+        for dist_name in dist_names:
+            if version := versions.get(_normalize_distribution_name(dist_name)):
+                index[import_name] = version
+                break
+
+    return index
+
+
+def _get_module_info(module) -> str:
+    # Get path
+    path = ""
+    if hasattr(module, "__path__") and module.__path__:
+        path = module.__path__[0]
+    elif hasattr(module, "__file__"):
+        path = module.__file__
+
+    if path:
+        try:
+            cwd = Path.cwd()
+            abs_path = Path(path).resolve()
+            if abs_path.is_relative_to(cwd):
+                path = str(abs_path.relative_to(cwd))
+        except (ValueError, OSError):
+            pass
+
+    # Get version
+    # Try modern way first (metadata), import names don't always match the distribution name (yaml -> PyYAML)
+    pkg_name = module.__name__.split(".")[0]
+    v = _distribution_versions().get(pkg_name)
+    if not v:
+        # Fallback to __version__ attribute
+        v = getattr(module, "__version__", None)
+
+    if v and v != "unknown version":
+        return f"{module.__name__} ({v}) from {path}"
+    return f"{module.__name__} from {path}"
+
+
+def output(
+    *,
+    kinds: Iterable[str] | None = None,
+    pattern: str | re.Pattern | None = None,
+    limit: int | None = None,
+    profile: bool = False,
+    pager: bool = False,
+    since_last: bool = False,
+    sizes: bool = False,
+    sort: Literal["name", "size"] | None = None,
+    table_sizes: bool = False,
+):
+    """Display relevant custom functions and variables with minimal formatting
+
+    Each section is built as a single `Text` and the whole report is written with one `console.print` call, which
+    is much cheaper than printing row by row on large namespaces or slow (SSH) terminals.
+
+    Args:
+        kinds: only render these sections, any of "functions", "classes", "modules" and "variables"
+        pattern: only render names matching a glob (`User*`) or a compiled regex
+        limit: maximum number of rows rendered per section
+        profile: include a "Startup Profile" section with the slowest steps and imports of `all_extras()`
+        pager: send the report through the console pager when it is taller than the terminal
+        since_last: only render names added or rebound since the previous `output()` call, and list removed ones
+        sizes: add an estimated deep memory size to each variable, bounded by a time and recursion budget
+        sort: "name" sorts every section alphabetically, "size" puts the heaviest variables first (implies `sizes`)
+        table_sizes: include a "Table Sizes" section with estimated row counts and sizes of the models' tables, from
+                     the database's catalog statistics
+    """
 
     console = Console()
     width = console.width
@@ -45,146 +195,171 @@ def output():
     del frame
     del calling_frame
 
-    ipython_path = Path.home() / ".ipython"
-    builtin_modules = {
-        "os",
-        "sys",
-        "json",
-        "tempfile",
-        "subprocess",
-        "importlib",
-        "pkgutil",
-        "ipython_playground",
-    }
-    exclude_vars = {"In", "Out", "PIPE", "get_ipython", "exit", "quit", "c"}
-    exclude_classes = {"Popen"}
-
-    def truncate_text(text: str, max_width: int) -> str:
-        if len(text) > max_width:
-            return text[: max_width - 3] + "..."
-        return text
-
-    def get_module_info(module) -> str:
-        # Get path
-        path = ""
-        if hasattr(module, "__path__") and module.__path__:
-            path = module.__path__[0]
-        elif hasattr(module, "__file__"):
-            path = module.__file__
-
-        if path:
-            try:
-                cwd = Path.cwd()
-                abs_path = Path(path).resolve()
-                if abs_path.is_relative_to(cwd):
-                    path = str(abs_path.relative_to(cwd))
-            except (ValueError, OSError):
-                pass
-
-        # Get version
-        v = None
-        # Try modern way first (metadata)
-        pkg_name = module.__name__.split(".")[0]
-        try:
-            v = importlib.metadata.version(pkg_name)
-        except (importlib.metadata.PackageNotFoundError, AttributeError, ValueError):
-            # Fallback to __version__ attribute
-            v = getattr(module, "__version__", None)
-
-        if v and v != "unknown version":
-            return f"{module.__name__} ({v}) from {path}"
-        return f"{module.__name__} from {path}"
+    full_index = classify_namespace(current_module)
+    snapshot = take_snapshot(current_module, full_index)
+
+    changes = None
+    if since_last and namespace.last_snapshot is not None:
+        changes = diff_snapshots(namespace.last_snapshot, snapshot)
+
+    namespace.last_snapshot = snapshot
+
+    # when sorting, the limit has to apply to the sorted result
+    index = full_index.filter(
+        kinds,
+        pattern,
+        None if sort else limit,
+        names=changes.added | changes.rebound if changes else None,
+    )
+    sections = KINDS if kinds is None else tuple(kinds)
+
+    sizes = sizes or sort == "size"
+    variable_sizes = {}
+    if sizes:
+        # sizing a proxy would import it
+        variable_sizes = sizing.size_all(
+            {k: v for k, v in index.variables.items() if not lazy.is_unloaded(v)}
+        )
+
+    def sort_key(item) -> Any:
+        name = item[0]
+        if sort == "name":
+            return name
+        # heaviest first, unsized (lazy) variables last
+        return -variable_sizes[name].bytes if name in variable_sizes else 1
+
+    if sort:
+        for kind in KINDS:
+            entries = list(getattr(index, kind).items())
+            # only variables have a size
+            if sort == "name" or kind == "variables":
+                entries.sort(key=sort_key)
+            setattr(index, kind, dict(entries[:limit]))
+
+    report: list[Text] = []
+    line_count = 0
+
+    def add_section(title: str, style: str = "bold blue"):
+        nonlocal line_count
+        text = Text(no_wrap=True, overflow="ellipsis")
+        text.append(f"\n{title}", style=style)
+        text.append("\n" + "─" * width)
+        report.append(text)
+        line_count += 3
+
+    def add_row(name: str, info: str, style: str):
+        nonlocal line_count
+        text = report[-1]
+        text.append(f"\n{name:<30}", style="cyan bold")
+        text.append(_truncate_text(info, width - 30), style=style)
+        line_count += 1
 
     # Functions Section
-    console.print("\n[bold blue]Custom Functions[/bold blue]")
-    console.print("─" * width)
-
-    for name, obj in current_module.items():
-        if (
-            inspect.isfunction(obj) and not name.startswith("_")
-            # and obj.__module__ == "__main__"
-        ):
-            # Get the source file of the function
-            try:
-                source_file = Path(inspect.getfile(obj))
-                # Skip if function is from .ipython directory
-                if ipython_path in source_file.parents:
-                    continue
-            except (TypeError, ValueError):
-                continue
+    if "functions" in sections:
+        add_section("Custom Functions")
 
+        for name, obj in index.functions.items():
             sig = _format_signature(obj)
+            if return_type := _format_return_type(obj):
+                sig += f" -> {return_type}"
 
-            try:
-                return_type = get_type_hints(obj).get("return", None)
-                if return_type:
-                    sig += f" -> {return_type.__name__}"
-            except NameError:
-                # This happens if the object was created with a class (like Engine) that was imported and used, but the
-                # symbol Engine is not present in the current module's namespace—maybe it was imported in another module,
-                # or imported and then deleted, or only referenced as a string in type hints. The object still has the
-                # correct type, but get_type_hints can't resolve the name unless Engine is available in the current globalns.
-                pass
-
-            text = Text()
-            text.append(f"{name:<30}", style="cyan bold")
-            text.append(truncate_text(sig, width - 30), style="green")
-            console.print(text)
+            add_row(name, sig, "green")
 
     # Classes Section
-    console.print("\n[bold blue]Classes[/bold blue]")
-    console.print("─" * width)
-
-    for name, obj in current_module.items():
-        if (
-            inspect.isclass(obj)
-            and not name.startswith("_")
-            and name not in exclude_classes
-        ):
-            sig = _format_signature(obj)
-            text = Text()
-            text.append(f"{name:<30}", style="cyan bold")
-            text.append(truncate_text(sig, width - 30), style="green")
-            console.print(text)
+    if "classes" in sections:
+        add_section("Classes")
+
+        for name, obj in index.classes.items():
+            add_row(name, _format_signature(obj), "green")
 
     # Modules Section
-    console.print("\n[bold blue]Imported Modules[/bold blue]")
-    console.print("─" * width)
-
-    for name, obj in current_module.items():
-        if (
-            inspect.ismodule(obj)
-            and not name.startswith("_")
-            and name not in builtin_modules
-            and name not in exclude_vars
-        ):
-            text = Text()
-            text.append(f"{name:<30}", style="cyan bold")
-            text.append(truncate_text(get_module_info(obj), width - 30), style="yellow")
-            console.print(text)
+    if "modules" in sections:
+        add_section("Imported Modules")
+
+        for name, obj in index.modules.items():
+            # inspecting an unloaded proxy would import it, which defeats the point
+            if isinstance(obj, lazy.LazyModule) and obj.load_error:
+                module_info = f"{obj.__name__} (import failed)"
+            elif lazy.is_unloaded(obj):
+                module_info = f"{obj.__name__} (not loaded)"
+            else:
+                module_info = _get_module_info(obj)
+
+            add_row(name, module_info, "yellow")
 
     # Variables Section
-    console.print("\n[bold blue]Variables[/bold blue]")
-    console.print("─" * width)
-
-    for name, obj in current_module.items():
-        if (
-            not inspect.isfunction(obj)
-            and not inspect.ismodule(obj)
-            and not inspect.isclass(obj)
-            and not name.startswith("_")
-            and name not in builtin_modules
-            and name not in exclude_vars
-        ):
+    if "variables" in sections:
+        add_section("Variables")
+
+        for name, obj in index.variables.items():
+            size_info = ""
+            if sizes:
+                size_info = f"{variable_sizes.get(name, '')!s:>10}  "
+
+            if isinstance(obj, lazy.LazyAttribute):
+                add_row(name, f"{size_info}{obj.lazy_path} (lazy, not loaded)", "dim")
+                continue
+
             type_info = type(obj).__name__
             if hasattr(obj, "__annotations__"):
                 annotations = getattr(obj, "__annotations__", {})
                 if annotations:
                     type_info += f" [{', '.join(str(v) for v in annotations.values())}]"
-            text = Text()
-            text.append(f"{name:<30}", style="cyan bold")
-            text.append(truncate_text(type_info, width - 30), style="green")
-            console.print(text)
+
+            add_row(name, size_info + type_info, "green")
+
+    # Table Sizes Section, one catalog query through the namespace's engine
+    if table_sizes and (engine := current_module.get("engine")) is not None:
+        add_section("Table Sizes")
+
+        try:
+            estimates = estimate_table_sizes(
+                lazy.unwrap(engine), model_tables(full_index.classes.values())
+            )
+        except Exception as e:  # noqa: BLE001 - an unreachable database shouldn't break the report
+            estimates = []
+            add_row("(unavailable)", f"{type(e).__name__}: {e}", "red")
+
+        for estimate in estimates:
+            style = (
+                "red"
+                if estimate.large
+                else ("dim" if estimate.rows is None else "green")
+            )
+            add_row(estimate.name, str(estimate), style)
+
+    # Removed Section, only when asking for changes since the last call
+    if changes and changes.removed:
+        add_section("Removed Since Last output()")
+
+        for name, type_name in changes.removed.items():
+            add_row(name, f"was {type_name}", "dim")
+
+    # Import Errors Section, collected from lazy and background imports
+    if kinds is None and lazy.import_errors:
+        add_section("Import Errors", style="bold red")
+
+        for module_name, error in lazy.import_errors.items():
+            add_row(module_name, f"{type(error).__name__}: {error}", "red")
+
+    # Startup Profile Section
+    if profile and timing.timings:
+        add_section("Startup Profile")
+
+        for record in timing.slowest():
+            add_row(
+                _truncate_text(record.name, 29),
+                f"{record.wall * 1000:>8.1f}ms wall {record.cpu * 1000:>8.1f}ms cpu "
+                f"{record.imports:>5} imports ({record.kind})",
+                "magenta",
+            )
+
+    # write the whole report at once, rather than measuring and flushing every row
+    if pager and line_count > console.height:
+        with console.pager(styles=True):
+            console.print(Group(*report))
+    else:
+        console.print(Group(*report))
 
 
 def all_extras(**kwargs):
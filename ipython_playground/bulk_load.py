@@ -0,0 +1,255 @@
+"""
+Load rows into a table in batches instead of one `session.add()` at a time.
+
+    sa_bulk_load(User, "users.csv")
+    sa_bulk_load(events_table, "events.jsonl", batch_size=10_000)
+    sa_bulk_load(User, ({"name": f"user {i}"} for i in range(100_000)))
+
+Sources are streamed, only one batch is held in memory. Batches go through Core `insert()` with executemany, which
+SQLAlchemy turns into multi-row INSERTs (insertmanyvalues) on dialects that support it, or `COPY ... FROM STDIN` on
+PostgreSQL. The load runs in a single transaction, nothing is inserted if a batch fails.
+"""
+
+import csv
+import datetime
+import decimal
+import io
+import itertools
+import json
+import time
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Literal
+
+from .logger import log
+
+BATCH_SIZE = 5_000
+PROGRESS_INTERVAL = 2.0
+"seconds between progress lines"
+
+LoadMethod = Literal["auto", "executemany", "copy"]
+
+
+@dataclass
+class BulkLoadResult:
+    table: str
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else float("inf")
+
+    def __str__(self) -> str:
+        return f"Loaded {self.rows:,} rows into {self.table} in {self.seconds:.2f}s ({self.rows_per_second:,.0f} rows/s)"
+
+
+def _table_of(target):
+    "the Table behind a SQLModel/declarative class, or `target` itself"
+    if hasattr(target, "__table__"):
+        return target.__table__
+    return target
+
+
+def _parse_bool(value: str) -> bool:
+    return value.strip().lower() in ("1", "t", "true", "y", "yes")
+
+
+_STRING_PARSERS: dict[type, Callable[[str], Any]] = {
+    int: int,
+    float: float,
+    decimal.Decimal: decimal.Decimal,
+    bool: _parse_bool,
+    datetime.datetime: datetime.datetime.fromisoformat,
+    datetime.date: datetime.date.fromisoformat,
+    datetime.time: datetime.time.fromisoformat,
+}
+
+
+def _column_parsers(table) -> dict[str, Callable[[str], Any]]:
+    "parsers for string values of typed columns, CSV values are all strings and JSON has no dates or decimals"
+
+    parsers = {}
+    for column in table.columns:
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            continue
+
+        if parser := _STRING_PARSERS.get(python_type):
+            parsers[column.key] = parser
+    return parsers
+
+
+def _parse_strings(row: dict, parsers: dict[str, Callable[[str], Any]]) -> dict:
+    "`row` with string values of typed columns parsed so their bind processors accept them"
+    return {
+        # an empty string in a typed column is a NULL
+        key: (None if value == "" else parsers[key](value))
+        if key in parsers and isinstance(value, str)
+        else value
+        for key, value in row.items()
+    }
+
+
+def _read_csv(path: Path, table) -> Iterator[dict]:
+    parsers = _column_parsers(table)
+    with path.open(newline="") as file:
+        for row in csv.DictReader(file):
+            yield _parse_strings(row, parsers)
+
+
+def _read_jsonl(path: Path, table) -> Iterator[dict]:
+    parsers = _column_parsers(table)
+    with path.open() as file:
+        for line in file:
+            if line.strip():
+                yield _parse_strings(json.loads(line), parsers)
+
+
+def _as_mapping(row, primary_key: set[str]) -> dict:
+    if isinstance(row, dict):
+        return row
+
+    # SQLModel / pydantic instances
+    if hasattr(row, "model_dump"):
+        values = row.model_dump()
+    else:
+        values = {k: v for k, v in vars(row).items() if not k.startswith("_")}
+
+    # unsaved instances have `id=None`, inserting it explicitly breaks serial and identity columns
+    return {
+        key: value
+        for key, value in values.items()
+        if not (value is None and key in primary_key)
+    }
+
+
+def iter_rows(source, table) -> Iterator[dict]:
+    """Rows of `source`: an iterable of dicts or model instances, or the path of a .csv or .jsonl file."""
+
+    if isinstance(source, str | Path):
+        path = Path(source)
+        if path.suffix == ".csv":
+            return _read_csv(path, table)
+        if path.suffix in (".jsonl", ".ndjson"):
+            return _read_jsonl(path, table)
+        raise ValueError(
+            f"Unsupported file type {path.suffix!r}, expected .csv or .jsonl"
+        )
+
+    primary_key = {column.key for column in table.primary_key.columns}
+    return (_as_mapping(row, primary_key) for row in source)
+
+
+def _batches(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, dict | list):
+        return json.dumps(value)
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value)
+
+
+def _copy_batch(connection, table, columns: list[str], batch: list[dict]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in batch:
+        writer.writerow([_copy_value(row.get(column)) for column in columns])
+
+    preparer = connection.dialect.identifier_preparer
+    sql = (
+        f"COPY {preparer.format_table(table)} ({', '.join(preparer.quote(c) for c in columns)}) "
+        "FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+    )
+
+    cursor = connection.connection.cursor()
+    try:
+        if connection.dialect.driver == "psycopg2":
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+        else:
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+
+def _use_copy(connection, method: LoadMethod) -> bool:
+    supported = (
+        connection.dialect.name == "postgresql"
+        and connection.dialect.driver
+        in (
+            "psycopg2",
+            "psycopg",
+        )
+    )
+    if method == "copy" and not supported:
+        raise ValueError(
+            f"COPY needs PostgreSQL with psycopg or psycopg2, not {connection.dialect.name}+{connection.dialect.driver}"
+        )
+    return method == "copy" or (method == "auto" and supported)
+
+
+def bulk_load(
+    engine,
+    target,
+    source,
+    *,
+    batch_size: int = BATCH_SIZE,
+    method: LoadMethod = "auto",
+) -> BulkLoadResult:
+    """Insert every row of `source` into `target` in batches of `batch_size`, logging rows/s as it goes.
+
+    Args:
+        target: a SQLModel or declarative class, or a Table
+        source: an iterable of dicts or model instances, or the path of a .csv or .jsonl file
+        method: `copy` uses COPY FROM STDIN (PostgreSQL only), `executemany` a batched INSERT, `auto` picks COPY
+                when it is available
+    """
+
+    table = _table_of(target)
+    known = set(table.columns.keys())
+    ignored: set[str] = set()
+
+    started = last_report = time.perf_counter()
+    loaded = 0
+
+    with engine.begin() as connection:
+        use_copy = _use_copy(connection, method)
+        insert = table.insert()
+
+        for batch in _batches(iter_rows(source, table), batch_size):
+            # keys which aren't columns make insert() fail, drop them and mention it once
+            if extra := batch[0].keys() - known - ignored:
+                ignored |= extra
+                log.warning(
+                    f"Ignoring keys which aren't columns of {table.name}: {sorted(extra)}"
+                )
+            if ignored:
+                batch = [{k: v for k, v in row.items() if k in known} for row in batch]
+
+            if use_copy:
+                _copy_batch(connection, table, list(batch[0]), batch)
+            else:
+                connection.execute(insert, batch)
+
+            loaded += len(batch)
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_INTERVAL:
+                log.info(
+                    f"{table.name}: {loaded:,} rows, {loaded / (now - started):,.0f} rows/s"
+                )
+                last_report = now
+
+    result = BulkLoadResult(table.name, loaded, time.perf_counter() - started)
+    log.info(str(result))
+    return result
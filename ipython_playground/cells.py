@@ -0,0 +1,110 @@
+"""
+One line summary after every IPython cell: wall time, CPU time, SQL statements, DB time and peak memory growth.
+
+SQL statements are counted by the query recorder attached to the playground engines, so nothing extra runs per
+statement. Peak memory is the growth of the process' peak RSS, which only moves when a cell uses more memory than
+the session ever has before.
+"""
+
+import sys
+import time
+from dataclasses import dataclass
+
+from rich.console import Console
+from rich.text import Text
+
+from . import queries
+from .sizing import format_size
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+
+def peak_rss() -> int | None:
+    "peak resident memory of this process in bytes, None where it isn't available"
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes everywhere else
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class CellStats:
+    wall: float
+    cpu: float
+    "seconds of process CPU time, background threads included"
+    statements: int
+    db_time: float
+    "seconds spent waiting on the database driver"
+    peak_memory: int | None
+    "bytes the process' peak RSS grew by"
+
+    def __str__(self) -> str:
+        summary = f"{self.wall:.2f}s wall, {self.cpu:.2f}s cpu, {self.statements} sql"
+        if self.statements:
+            summary += f" in {self.db_time:.3f}s"
+        if self.peak_memory:
+            summary += f", +{format_size(self.peak_memory)} peak"
+        return summary
+
+
+class CellMonitor:
+    """Snapshots counters before a cell runs and reports the difference after it finishes."""
+
+    def __init__(self, recorder: queries.QueryRecorder = queries.recorder):
+        self.recorder = recorder
+        self.last: CellStats | None = None
+        self._start: tuple[float, float, int, float, int | None] | None = None
+
+    def pre_run_cell(self, info=None):
+        self._start = (
+            time.perf_counter(),
+            time.process_time(),
+            self.recorder.statement_count,
+            self.recorder.total_duration,
+            peak_rss(),
+        )
+
+    def post_run_cell(self, result=None) -> CellStats | None:
+        if self._start is None:
+            # registered while a cell was running
+            return None
+
+        wall, cpu, statements, db_time, peak = self._start
+        self._start = None
+
+        current_peak = peak_rss()
+        self.last = CellStats(
+            wall=time.perf_counter() - wall,
+            cpu=time.process_time() - cpu,
+            statements=self.recorder.statement_count - statements,
+            db_time=self.recorder.total_duration - db_time,
+            peak_memory=None
+            if peak is None or current_peak is None
+            else current_peak - peak,
+        )
+
+        Console().print(Text(str(self.last), style="dim"))
+        return self.last
+
+
+def register_cell_stats() -> CellMonitor | None:
+    """Print a summary after every IPython cell. Returns None outside of IPython."""
+
+    try:
+        from IPython import get_ipython  # type: ignore
+    except ImportError:
+        return None
+
+    ipython = get_ipython()
+    if ipython is None:
+        return None
+
+    monitor = CellMonitor()
+    ipython.events.register("pre_run_cell", monitor.pre_run_cell)
+    ipython.events.register("post_run_cell", monitor.post_run_cell)
+    return monitor
@@ -0,0 +1,116 @@
+"""
+Columnar conversion of query results for `sa_run(stmt, as_=...)`.
+
+Results are read in chunks from a streaming cursor and each chunk is turned into column buffers right away, so the
+full result never exists as a list of `Row` objects. pyarrow, NumPy and pandas are all optional: when the one needed
+is missing, a warning is logged and the caller falls back to plain rows.
+"""
+
+import importlib
+from collections.abc import Iterator
+from typing import Any, Literal
+
+from .logger import log
+
+ColumnarFormat = Literal["arrow", "numpy", "pandas"]
+COLUMNAR_FORMATS = ("arrow", "numpy", "pandas")
+
+
+def _optional_import(name: str):
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+def _check_format(as_: str):
+    if as_ not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unknown format {as_!r}, expected one of {COLUMNAR_FORMATS}")
+
+
+def missing_dependency(as_: ColumnarFormat) -> str | None:
+    "name of the library `as_` needs which isn't installed, if any"
+    _check_format(as_)
+    required = {"arrow": "pyarrow", "numpy": "numpy", "pandas": "pandas"}[as_]
+    return None if _optional_import(required) else required
+
+
+def _unique_keys(keys: list[str]) -> list[str]:
+    "`keys` with repeats suffixed `_1`, `_2`... like SQLAlchemy labels them, a join selecting two `id` columns"
+    seen: set[str] = set(keys)
+    counts: dict[str, int] = {}
+    unique = []
+    for key in keys:
+        if key not in counts:
+            counts[key] = 0
+            unique.append(key)
+            continue
+
+        while True:
+            counts[key] += 1
+            candidate = f"{key}_{counts[key]}"
+            if candidate not in seen:
+                break
+
+        seen.add(candidate)
+        unique.append(candidate)
+
+    return unique
+
+
+def to_arrow(keys: list[str], chunks: Iterator[list]) -> Any:
+    import pyarrow as pa  # type: ignore
+
+    tables = [
+        pa.Table.from_arrays(
+            [pa.array(column) for column in zip(*chunk, strict=True)], names=keys
+        )
+        for chunk in chunks
+    ]
+
+    if not tables:
+        return pa.table({key: pa.array([]) for key in keys})
+
+    # types are inferred per chunk: an all-NULL chunk is typed `null`, and on SQLite a column can be int64 in one chunk
+    # and double in the next. Permissive promotion widens them to a common type.
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+def to_numpy(keys: list[str], chunks: Iterator[list]) -> dict[str, Any]:
+    """One array per column. Columns mixing types (or NULLs with numbers) become object arrays."""
+    import numpy as np  # type: ignore
+
+    columns: list[list] = [[] for _ in keys]
+    for chunk in chunks:
+        for arrays, column in zip(columns, zip(*chunk, strict=True), strict=True):
+            arrays.append(np.asarray(column))
+
+    return {
+        key: np.concatenate(arrays) if arrays else np.asarray([])
+        for key, arrays in zip(keys, columns, strict=True)
+    }
+
+
+def to_pandas(keys: list[str], chunks: Iterator[list]) -> Any:
+    # arrow builds the columns without a python object per cell, use it when it is around
+    if _optional_import("pyarrow"):
+        return to_arrow(keys, chunks).to_pandas()
+
+    import pandas as pd  # type: ignore
+
+    frames = [pd.DataFrame.from_records(chunk, columns=keys) for chunk in chunks]
+    if not frames:
+        return pd.DataFrame(columns=keys)
+    return pd.concat(frames, ignore_index=True)
+
+
+CONVERTERS = {"arrow": to_arrow, "numpy": to_numpy, "pandas": to_pandas}
+
+
+def convert(as_: ColumnarFormat, keys: list[str], chunks: Iterator[list]) -> Any:
+    _check_format(as_)
+
+    # a dict of arrays can't hold two `id` columns, and arrow can't concatenate chunks which have them
+    keys = _unique_keys(keys)
+    log.debug(f"Converting result columns {keys} to {as_}")
+    return CONVERTERS[as_](keys, chunks)
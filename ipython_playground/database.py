@@ -1,29 +1,479 @@
+import asyncio
+import itertools
+from collections.abc import AsyncGenerator, Callable, Generator, Iterator
+from concurrent.futures import Future
+from typing import Any
+
+from . import columnar, guard, lazy, queries, result_cache
+from .columnar import ColumnarFormat
+from .engines import (
+    PoolConfig,
+    dispose_engine,
+    engine_status,
+    get_async_engine,
+    get_engine,
+)
+from .guard import guarded_run
+from .lazy import PendingValue
 from .logger import log
+from .result_cache import ResultCache, cache_key, is_cacheable
+from .timing import timed
+
+DEFAULT_MAX_ROWS = 10_000
+"rows `sa_run` returns unless told otherwise, so an accidental full table scan doesn't take the kernel down"
+
+STREAM_CHUNK_SIZE = 1_000
+
+
+def stream_statement(
+    session, stmt, *, chunk_size: int = STREAM_CHUNK_SIZE
+) -> Generator:
+    """Yield result rows, fetching `chunk_size` rows at a time with a server-side cursor where the driver supports one."""
+
+    result = session.execute(
+        stmt, execution_options={"yield_per": chunk_size, "stream_results": True}
+    )
+
+    fetched = 0
+    try:
+        for row in result:
+            fetched += 1
+            yield row
+    finally:
+        # closes the cursor if the caller stops early
+        result.close()
+        queries.recorder.record_fetched(result, fetched)
+
+
+def _warn_truncated(max_rows: int):
+    log.warning(
+        f"Result truncated to {max_rows} rows, pass max_rows=None to fetch everything or use sa_stream"
+    )
+
+
+def _fetch_chunks(
+    result, *, max_rows: int | None, chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[list]:
+    "lists of at most `chunk_size` rows, stopping with a warning once more than `max_rows` rows come back"
+
+    remaining = max_rows
+    fetched = 0
+    try:
+        while True:
+            # ask for one row past the cap so truncation is detected without reading another full chunk
+            size = chunk_size if remaining is None else min(chunk_size, remaining + 1)
+            chunk = result.fetchmany(size)
+            fetched += len(chunk)
+            if not chunk:
+                return
+
+            if remaining is not None:
+                if len(chunk) > remaining:
+                    _warn_truncated(max_rows)  # type: ignore[arg-type]
+                    if remaining:
+                        yield chunk[:remaining]
+                    return
+                remaining -= len(chunk)
+
+            yield chunk
+    finally:
+        result.close()
+        queries.recorder.record_fetched(result, fetched)
+
+
+def run_columnar(
+    session,
+    stmt,
+    as_: ColumnarFormat,
+    *,
+    max_rows: int | None = DEFAULT_MAX_ROWS,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> Any:
+    """Execute `stmt` and return its columns as an Arrow table, a dict of NumPy arrays or a pandas DataFrame.
+
+    Rows are converted a chunk at a time as they come off the cursor. Returns plain rows when the library `as_`
+    needs isn't installed.
+    """
+
+    if missing := columnar.missing_dependency(as_):
+        log.warning(f"{missing} is not installed, returning rows instead of {as_}")
+        return run_statement(session, stmt, max_rows=max_rows)
+
+    result = session.execute(
+        stmt, execution_options={"yield_per": chunk_size, "stream_results": True}
+    )
+    keys = list(result.keys())
+    chunks = _fetch_chunks(result, max_rows=max_rows, chunk_size=chunk_size)
+
+    return columnar.convert(as_, keys, chunks)
+
+
+def run_statement(
+    session,
+    stmt,
+    *,
+    max_rows: int | None = DEFAULT_MAX_ROWS,
+    as_: ColumnarFormat | None = None,
+) -> Any:
+    """Execute `stmt` and return at most `max_rows` rows, or every row when `max_rows` is None.
+
+    Pass `as_="arrow" | "numpy" | "pandas"` to get columns back instead of rows, see `run_columnar`.
+    """
+
+    if as_ is not None:
+        return run_columnar(session, stmt, as_, max_rows=max_rows)
+
+    if max_rows is None:
+        result = session.execute(stmt)
+        rows = result.all()
+        queries.recorder.record_fetched(result, len(rows))
+        return rows
+
+    # stream so only max_rows + 1 rows are ever pulled from the database
+    stream = stream_statement(session, stmt)
+    try:
+        rows = list(itertools.islice(stream, max_rows + 1))
+    finally:
+        stream.close()
+
+    if len(rows) > max_rows:
+        _warn_truncated(max_rows)
+        del rows[max_rows:]
+
+    return rows
+
+
+# drivers `setup_database_session(asynchronous=True)` swaps in for the app's sync driver
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+}
+
+
+def async_database_url(database_url: str) -> str:
+    """The same database with an async driver. `postgresql+psycopg` and URLs naming an async driver are kept."""
+    from sqlalchemy.engine import make_url  # type: ignore
+
+    url = make_url(database_url)
+    drivername = ASYNC_DRIVERS.get(url.drivername)
+    if drivername is None:
+        return database_url
+
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+async def astream_statement(
+    session, stmt, *, chunk_size: int = STREAM_CHUNK_SIZE
+) -> AsyncGenerator:
+    """`stream_statement` for an `AsyncSession`, use with `async for`."""
+
+    result = await session.stream(stmt, execution_options={"yield_per": chunk_size})
+
+    try:
+        async for row in result:
+            yield row
+    finally:
+        await result.close()
+
+
+async def arun_statement(
+    session, stmt, *, max_rows: int | None = DEFAULT_MAX_ROWS
+) -> list:
+    """`run_statement` for an `AsyncSession`."""
+
+    if max_rows is None:
+        return (await session.execute(stmt)).all()
+
+    rows = []
+    stream = astream_statement(session, stmt)
+    try:
+        async for row in stream:
+            rows.append(row)
+            if len(rows) > max_rows:
+                _warn_truncated(max_rows)
+                del rows[max_rows:]
+                break
+    finally:
+        await stream.aclose()
+
+    return rows
+
+
+async def arun_concurrently(
+    engine, *stmts, max_rows: int | None = DEFAULT_MAX_ROWS, session_class=None
+) -> list[list]:
+    """Run each statement in its own session on its own pooled connection, at the same time.
+
+    Returns the rows of each statement in the order they were passed. The engine's pool size bounds how many
+    actually run at once, the rest wait for a connection.
+    """
+    from sqlalchemy.ext.asyncio import AsyncSession  # type: ignore
+
+    session_class = session_class or AsyncSession
+
+    async def run(stmt):
+        async with session_class(engine) as session:
+            return await arun_statement(session, stmt, max_rows=max_rows)
 
+    return list(await asyncio.gather(*(run(stmt) for stmt in stmts)))
 
-def setup_database_session(database_url):
-    """Set up the SQLAlchemy engine and session, return helpful globals"""
+
+def cached_run_statement(
+    cache: ResultCache,
+    session,
+    stmt,
+    *,
+    max_rows: int | None = DEFAULT_MAX_ROWS,
+    as_: ColumnarFormat | None = None,
+    run: Callable[[], Any] | None = None,
+    cache_text: bool = False,
+) -> Any:
+    """`run_statement` through `cache`, keyed by the database, the compiled SQL and its parameters.
+
+    Only selects are cached, and `text()` statements with `cache_text`. Anything else runs every time. `run` replaces
+    `run_statement`, to run the statement some other way (guarded, etc).
+    """
+
+    run = run or (lambda: run_statement(session, stmt, max_rows=max_rows, as_=as_))
+    if not is_cacheable(stmt, text=cache_text):
+        return run()
+
+    key, sql = cache_key(session, stmt, max_rows, as_)
+    return cache.get_or_run(key, sql, run)
+
+
+def _connect(engine) -> None:
+    "open and return a pooled connection, so the first query doesn't pay for the TCP and TLS handshake"
+
+    url = engine.url.render_as_string(hide_password=True)
+    try:
+        with timed(f"connect {url}"), engine.connect():
+            pass
+    except Exception as e:  # noqa: BLE001 - reported here, using the engine raises the real error again
+        log.warning(f"Could not connect to {url}: {e}")
+
+
+def connect_in_background(engine) -> Future:
+    """Warm `engine`'s pool on the playground worker pool. The future never raises, failures are logged."""
+    return lazy._get_executor().submit(_connect, engine)
+
+
+def setup_async_database_session(database_url, *, pool: PoolConfig = None):
+    """Set up an `AsyncEngine` and `AsyncSession` for the same database, return helpful globals
+
+    The helpers are coroutines, IPython's top-level await runs them: `await asa_run(stmt)`, `async for row in
+    asa_stream(stmt)` and `await asa_gather(stmt_a, stmt_b)`.
+    """
+    from activemodel.session_manager import _serialize_pydantic_model  # type: ignore
+    from sqlmodel.ext.asyncio.session import AsyncSession  # type: ignore
+
+    async def asa_run(stmt, *, max_rows: int | None = DEFAULT_MAX_ROWS):
+        return await arun_statement(async_session, stmt, max_rows=max_rows)
+
+    def asa_stream(stmt, *, chunk_size: int = STREAM_CHUNK_SIZE):
+        return astream_statement(async_session, stmt, chunk_size=chunk_size)
+
+    async def asa_gather(*stmts, max_rows: int | None = DEFAULT_MAX_ROWS):
+        return await arun_concurrently(
+            async_engine, *stmts, max_rows=max_rows, session_class=AsyncSession
+        )
+
+    async_engine = get_async_engine(
+        async_database_url(database_url),
+        pool,
+        json_serializer=_serialize_pydantic_model,
+    )
+    async_session = AsyncSession(async_engine)
+
+    queries.recorder.attach(async_engine.sync_engine)
+
+    return {
+        "async_engine": async_engine,
+        "async_session": async_session,
+        "asa_run": asa_run,
+        "asa_stream": asa_stream,
+        "asa_gather": asa_gather,
+    }
+
+
+def setup_database_session(
+    database_url,
+    *,
+    pool: PoolConfig = None,
+    background: bool = False,
+    asynchronous: bool = False,
+    query_cache: bool | dict[str, Any] = False,
+    guarded: bool | dict[str, Any] = False,
+):
+    """Set up the SQLAlchemy engine and session, return helpful globals
+
+    The engine comes from the engine cache, so setting up a database which was used earlier in the session reuses
+    its connection pool.
+
+    With `background`, the first connection is opened on a worker thread and `engine` and `session` are returned as
+    handles which wait for it on first use, only if it is still connecting.
+
+    With `asynchronous`, an async engine and session are set up as well, see `setup_async_database_session`.
+
+    With `query_cache`, `sa_run` results are cached, pass a dict of `ResultCache` arguments to configure it.
+
+    With `guarded`, `sa_run` limits, cost checks and times out statements, pass a dict of `GuardOptions` fields to
+    configure it.
+    """
     from activemodel import SessionManager  # type: ignore
-    from activemodel.session_manager import _session_context  # type: ignore
+    from activemodel.session_manager import (  # type: ignore
+        _serialize_pydantic_model,
+        _session_context,
+    )
     from activemodel.utils import compile_sql  # type: ignore
-    from sqlalchemy import create_engine  # type: ignore
+    from sqlmodel import Session, SQLModel  # type: ignore
 
-    def sa_run(stmt):
-        result = session.execute(stmt).all()
-        return result
+    from .bulk_load import BATCH_SIZE, LoadMethod, bulk_load
+    from .identity_map import (
+        ITERATION_CHUNK_SIZE,
+        expunge,
+        read_only_iteration,
+        reset_session,
+        show_identity_map,
+    )
+    from .shards import run_on_shards
+    from .table_sizes import show_table_sizes
+
+    def sa_run(
+        stmt,
+        *,
+        max_rows: int | None = DEFAULT_MAX_ROWS,
+        as_: ColumnarFormat | None = None,
+        cache: bool | None = None,
+        force: bool = False,
+    ):
+        """`cache=False` skips the result cache, `cache=True` also caches a `text()` statement, which is only safe
+        when it doesn't write. `force=True` runs statements the guard would refuse as too costly.
+
+        Both only matter when the cache or guard was enabled.
+        """
+
+        def execute():
+            if guard.options is None:
+                return run_statement(session, stmt, max_rows=max_rows, as_=as_)
+
+            return guarded_run(
+                session,
+                stmt,
+                lambda guarded: run_statement(
+                    session, guarded, max_rows=max_rows, as_=as_
+                ),
+                guard.options,
+                max_rows=max_rows,
+                force=force,
+            )
+
+        if cache is False or result_cache.cache is None:
+            return execute()
+
+        return cached_run_statement(
+            result_cache.cache,
+            session,
+            stmt,
+            max_rows=max_rows,
+            as_=as_,
+            run=execute,
+            cache_text=cache is True,
+        )
+
+    def sa_stream(stmt, *, chunk_size: int = STREAM_CHUNK_SIZE):
+        return stream_statement(session, stmt, chunk_size=chunk_size)
 
     def sa_sql(stmt):
         return compile_sql(stmt)
 
-    engine = create_engine(database_url, echo=True)
-    session = SessionManager.get_instance().get_session().__enter__()
+    # session events and the identity map belong to the real session, not the background_connect handle
+    def sa_identity_map():
+        show_identity_map(lazy.unwrap(session))
+
+    def sa_expunge(*models: type) -> int:
+        return expunge(lazy.unwrap(session), *models)
+
+    def sa_reset_session() -> int:
+        return reset_session(lazy.unwrap(session))
+
+    def sa_iterate(stmt, *, chunk_size: int = ITERATION_CHUNK_SIZE):
+        return read_only_iteration(lazy.unwrap(session), stmt, chunk_size=chunk_size)
+
+    def sa_table_sizes(*models):
+        """Estimated row counts and sizes of `models`' tables, every table SQLModel knows about by default."""
+        show_table_sizes(engine, models or SQLModel.metadata.sorted_tables)
+
+    def sa_bulk_load(
+        target, source, *, batch_size: int = BATCH_SIZE, method: LoadMethod = "auto"
+    ):
+        result = bulk_load(engine, target, source, batch_size=batch_size, method=method)
+        # cached results of the table are stale now
+        if result_cache.cache is not None:
+            result_cache.cache.invalidate(result.table)
+        return result
+
+    # echo formats and logs every statement, the recorder is cheap and echo can be switched on with sa_echo()
+    # pydantic models in JSON columns are serialized the same way activemodel's own engine does it
+    engine = get_engine(database_url, pool, json_serializer=_serialize_pydantic_model)
+
+    # activemodel's engine is fixed to the first URL it sees, bind the session to ours so resets switch databases
+    SessionManager.get_instance(database_url)
+    session = Session(engine)
     _session_context.set(session)
 
-    return {"engine": engine, "session": session, "sa_sql": sa_sql, "sa_run": sa_run}
+    queries.recorder.attach(engine)
+
+    if query_cache:
+        result_cache.configure(query_cache)
+
+    if guarded:
+        guard.configure(guarded)
 
+    if background:
+        connected = connect_in_background(engine)
+        engine = PendingValue(engine, connected, "engine")
+        session = PendingValue(session, connected, "session")
 
-def reset_database_session(database_url: str):
-    """Reset the database session with a new database URL"""
+    helpers = {
+        "engine": engine,
+        "session": session,
+        "sa_sql": sa_sql,
+        "sa_run": sa_run,
+        "sa_stream": sa_stream,
+        "sa_fanout": run_on_shards,
+        "sa_bulk_load": sa_bulk_load,
+        "sa_table_sizes": sa_table_sizes,
+        "sa_identity_map": sa_identity_map,
+        "sa_expunge": sa_expunge,
+        "sa_reset_session": sa_reset_session,
+        "sa_iterate": sa_iterate,
+        "sa_cache": result_cache.cache,
+        "sa_queries": queries.recorder,
+        "sa_slowest": queries.show_slowest,
+        "sa_echo": queries.set_echo,
+        "sa_engines": engine_status,
+        "sa_dispose": dispose_engine,
+    }
+
+    if asynchronous:
+        helpers |= setup_async_database_session(database_url, pool=pool)
+
+    return helpers
+
+
+def reset_database_session(
+    database_url: str, *, pool: PoolConfig = None, asynchronous: bool = False
+):
+    """Reset the database session with a new database URL
+
+    The previous engine stays cached with its pool, switching back to it later doesn't reconnect. Use
+    `dispose_engine()` to close pools which aren't needed anymore.
+    """
     from activemodel.session_manager import _session_context  # type: ignore
 
     log.info(f"Resetting database session with URL: {database_url}")
@@ -36,8 +486,11 @@ def reset_database_session(database_url: str):
     except Exception as e:
         log.debug(f"No existing session to close: {e}")
 
+    # activemodel hands out the session in the context var, a closed one must not be reused
+    _session_context.set(None)
+
     # Set up new session
-    return setup_database_session(database_url)
+    return setup_database_session(database_url, pool=pool, asynchronous=asynchronous)
 
 
 def get_database_url() -> str | None:
@@ -0,0 +1,145 @@
+"""
+Engines shared across `reset_database_session` calls, keyed by database URL and pool options.
+
+Switching back to a database reuses its engine and warm connection pool instead of reconnecting from scratch, and
+engines are only disposed when asked to.
+"""
+
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any
+
+from .logger import log
+
+if TYPE_CHECKING:
+    from sqlalchemy import Engine  # type: ignore
+    from sqlalchemy.ext.asyncio import AsyncEngine  # type: ignore
+
+
+@dataclass(frozen=True)
+class PoolOptions:
+    size: int | None = None
+    "connections kept open, SQLAlchemy's default when None"
+    max_overflow: int | None = None
+    "connections opened beyond `size` under load"
+    pre_ping: bool = True
+    "test connections before handing them out, matches activemodel's engine"
+    recycle: int = -1
+    "seconds after which a connection is replaced, -1 to keep connections forever"
+    timeout: float | None = None
+    "seconds to wait for a connection when the pool is exhausted"
+
+    def engine_kwargs(self) -> dict[str, Any]:
+        kwargs: dict[str, Any] = {
+            "pool_pre_ping": self.pre_ping,
+            "pool_recycle": self.recycle,
+        }
+        # not every pool class accepts these (SQLite in-memory databases use a singleton pool), only pass them if set
+        if self.size is not None:
+            kwargs["pool_size"] = self.size
+        if self.max_overflow is not None:
+            kwargs["max_overflow"] = self.max_overflow
+        if self.timeout is not None:
+            kwargs["pool_timeout"] = self.timeout
+        return kwargs
+
+
+PoolConfig = PoolOptions | dict[str, Any] | None
+"`all_extras(pool=...)` accepts options or a dict of their fields, e.g. `{'size': 10, 'recycle': 1800}`"
+
+engines: dict[tuple[str, PoolOptions, bool], Any] = {}
+"(database url, pool options, is async) -> engine"
+
+
+def pool_options(pool: PoolConfig) -> PoolOptions:
+    if pool is None:
+        return PoolOptions()
+    if isinstance(pool, PoolOptions):
+        return pool
+    return PoolOptions(**pool)
+
+
+def _cached_engine(
+    database_url: str, pool: PoolConfig, asynchronous: bool, engine_options: dict
+) -> Any:
+    "an `Engine` or an `AsyncEngine` depending on `asynchronous`, typed by `get_engine` and `get_async_engine`"
+    options = pool_options(pool)
+    key = (database_url, options, asynchronous)
+
+    if engine := engines.get(key):
+        log.debug(f"Reusing engine for {engine.url!r}")
+        return engine
+
+    if asynchronous:
+        from sqlalchemy.ext.asyncio import create_async_engine  # type: ignore
+
+        engine = create_async_engine(
+            database_url, **options.engine_kwargs(), **engine_options
+        )
+    else:
+        from sqlalchemy import create_engine  # type: ignore
+
+        engine = create_engine(
+            database_url, **options.engine_kwargs(), **engine_options
+        )
+
+    engines[key] = engine
+    return engine
+
+
+def get_engine(
+    database_url: str, pool: PoolConfig = None, **engine_options
+) -> "Engine":
+    """Return the engine for `database_url` and `pool`, creating it on first use.
+
+    `engine_options` are passed to `create_engine` when the engine is created and aren't part of the cache key.
+    """
+    return _cached_engine(database_url, pool, False, engine_options)
+
+
+def get_async_engine(
+    database_url: str, pool: PoolConfig = None, **engine_options
+) -> "AsyncEngine":
+    """`get_engine` for an `AsyncEngine`, `database_url` has to name an async driver (see `async_database_url`)."""
+    return _cached_engine(database_url, pool, True, engine_options)
+
+
+def dispose_engine(database_url: str | None = None, pool: PoolConfig = None) -> int:
+    """Close the pools of cached engines and forget them, returning how many were disposed.
+
+    With no arguments every engine is disposed. With only `database_url`, every engine for that URL is, whatever its
+    pool options.
+    """
+
+    options = None if pool is None else pool_options(pool)
+    disposed = 0
+
+    for key in list(engines):
+        url, key_options, asynchronous = key
+        if database_url is not None and url != database_url:
+            continue
+        if options is not None and key_options != options:
+            continue
+
+        engine = engines.pop(key)
+        log.debug(f"Disposing engine for {engine.url!r}")
+        if asynchronous:
+            # closing async connections needs the event loop, drop the pool and let them be garbage collected
+            engine.sync_engine.dispose(close=False)
+        else:
+            engine.dispose()
+        disposed += 1
+
+    return disposed
+
+
+def engine_status() -> list[dict[str, Any]]:
+    """Cached engines with their pool options and current pool status, passwords hidden."""
+
+    return [
+        {
+            "url": engine.url.render_as_string(hide_password=True),
+            "pool": asdict(options),
+            "status": engine.pool.status(),
+        }
+        for (_, options, _), engine in engines.items()
+    ]
@@ -1,37 +1,53 @@
 # ruff: noqa: F401
 
+import builtins
+import importlib.util
 import inspect
-import pkgutil
+import keyword
+import re
 import sys
 from types import ModuleType
 from typing import Optional
 
+from .engines import PoolConfig
+from .lazy import (
+    LazyAttribute,
+    LazyModule,
+    import_errors,
+    is_unloaded,
+    unwrap,
+    wait_until_loaded,
+    warm,
+)
 from .logger import log
+from .timing import timed, timings
 
+APP_MODULES = ("app.models", "app.commands", "app.jobs")
 
-def load_app_modules() -> dict:
-    """Attempt to import common app modules and return them in a dict."""
-    modules = {}
-    try:
-        import app.models  # type: ignore
 
-        modules["app.models"] = app.models
-    except ImportError:
-        log.warning("Could not import app.models")
+def load_app_modules(*, background: bool = False, lazy: bool = False) -> dict:
+    """Attempt to import common app modules and return them in a dict.
 
-    try:
-        import app.commands  # type: ignore
+    With `background`, the imports are started on the import worker pool and lazy proxies are returned right away.
+    Failures are collected in `lazy.import_errors` instead of being logged. With `lazy`, proxies are returned which
+    import on first use.
+    """
+    modules = {}
 
-        modules["app.commands"] = app.commands
-    except ImportError:
-        log.warning("Could not import app.commands")
+    for module_name in APP_MODULES:
+        if background:
+            modules[module_name] = warm(LazyModule(module_name))
+            continue
 
-    try:
-        import app.jobs  # type: ignore
+        if lazy:
+            modules[module_name] = LazyModule(module_name)
+            continue
 
-        modules["app.jobs"] = app.jobs
-    except ImportError:
-        log.warning("Could not import app.jobs")
+        try:
+            with timed(f"import {module_name}", kind="import"):
+                modules[module_name] = importlib.import_module(module_name)
+        except ImportError:
+            log.warning(f"Could not import {module_name}")
 
     return modules
 
@@ -40,11 +56,12 @@ def get_default_module_imports():
     """Get the default list of modules to import with their aliases and options."""
     return [
         # Built-in modules - always available
-        {"module": "json"},
-        {"module": "re"},
+        {"module": "json", "eager": True},
+        {"module": "re", "eager": True},
         {
             "module": "typing",
             "alias": "t",
+            "eager": True,
             "extra_imports": [
                 {"from": "typing", "import": "List"},
                 {"from": "typing", "import": "Any"},
@@ -57,6 +74,7 @@ def get_default_module_imports():
         # Additional built-in and common imports
         {
             "module": "datetime",
+            "eager": True,
             "extra_imports": [{"from": "datetime", "import": "datetime"}],
         },
         {
@@ -88,7 +106,13 @@ def get_default_module_imports():
     ]
 
 
-def load_modules_for_ipython(module_imports=None) -> dict:
+def load_modules_for_ipython(
+    module_imports=None,
+    *,
+    lazy: bool = False,
+    background: bool = False,
+    lazy_app_modules: bool = False,
+) -> dict:
     """Load list of common modules for use in ipython sessions and return them as a dict so they can be appended to the global namespace
 
     Args:
@@ -98,12 +122,17 @@ def load_modules_for_ipython(module_imports=None) -> dict:
                        - alias: name to use in namespace (optional, defaults to module name)
                        - log_warning: whether to log warning on import failure (optional, defaults to False)
                        - extra_imports: list of additional imports from the module (optional)
+                       - eager: import immediately even when `lazy` is set (optional, defaults to False)
+        lazy: inject proxies which import the module on first attribute access instead of importing up front
+        background: inject proxies for every entry and import them on a worker pool right away, `eager` entries
+                    included. Accessing a name which is still importing blocks on that import only.
+        lazy_app_modules: inject proxies for the `app.*` modules instead of importing them
     """
 
     modules = {}
 
     # Load app modules
-    modules.update(load_app_modules())
+    modules.update(load_app_modules(background=background, lazy=lazy_app_modules))
 
     if module_imports is None:
         module_imports = get_default_module_imports()
@@ -114,37 +143,122 @@ def load_modules_for_ipython(module_imports=None) -> dict:
         log_warning = import_config.get("log_warning", False)
         extra_imports = import_config.get("extra_imports", [])
 
-        try:
-            imported_module = __import__(module_name)
-            modules[alias] = imported_module
-
-            # Handle extra imports from the module
-            for extra_import in extra_imports:
-                from_module = extra_import["from"]
-                import_name = extra_import["import"]
-                import_alias = extra_import.get("alias", import_name)
-
-                try:
-                    # Use importlib for from imports
-                    import importlib
-
-                    mod = importlib.import_module(from_module)
-                    modules[import_alias] = getattr(mod, import_name)
-                except (ImportError, AttributeError) as e:
-                    if log_warning:
-                        log.warning(
-                            f"Could not import {import_name} from {from_module}: {e}"
-                        )
+        # nothing to gain from a proxy if the module was already imported by someone else
+        deferred = background or (lazy and not import_config.get("eager", False))
+        if deferred and module_name not in sys.modules:
+            modules.update(
+                _lazy_module_entry(
+                    module_name, alias, extra_imports, log_warning, background
+                )
+            )
+            continue
 
-        except ImportError:
-            if log_warning:
-                log.warning(f"Could not import {module_name}")
+        with timed(f"import {module_name}", kind="import"):
+            modules.update(
+                _import_module_entry(module_name, alias, extra_imports, log_warning)
+            )
 
     return modules
 
 
+def _import_module_entry(
+    module_name: str, alias: str, extra_imports: list, log_warning: bool
+) -> dict:
+    "import a single import config entry right away"
+
+    entry: dict = {}
+
+    try:
+        imported_module = __import__(module_name)
+        entry[alias] = imported_module
+
+        # Handle extra imports from the module
+        for extra_import in extra_imports:
+            from_module = extra_import["from"]
+            import_name = extra_import["import"]
+            import_alias = extra_import.get("alias", import_name)
+
+            try:
+                # Use importlib for from imports
+                import importlib
+
+                mod = importlib.import_module(from_module)
+                entry[import_alias] = getattr(mod, import_name)
+            except (ImportError, AttributeError) as e:
+                if log_warning:
+                    log.warning(
+                        f"Could not import {import_name} from {from_module}: {e}"
+                    )
+
+    except ImportError:
+        if log_warning:
+            log.warning(f"Could not import {module_name}")
+
+    return entry
+
+
+def _lazy_module_entry(
+    module_name: str,
+    alias: str,
+    extra_imports: list,
+    log_warning: bool,
+    background: bool,
+) -> dict:
+    "build lazy proxies for a single import config entry without importing the module"
+
+    # find_spec only looks the module up on sys.path, it does not execute it
+    try:
+        spec = importlib.util.find_spec(module_name)
+    except (ImportError, ValueError):
+        spec = None
+
+    if spec is None:
+        if log_warning and background:
+            import_errors[module_name] = ModuleNotFoundError(
+                f"No module named '{module_name}'"
+            )
+        elif log_warning:
+            log.warning(f"Could not import {module_name}")
+        return {}
+
+    proxy = LazyModule(module_name)
+    if background:
+        warm(proxy)
+
+    entry: dict = {alias: proxy}
+    for extra_import in extra_imports:
+        import_name = extra_import["import"]
+        import_alias = extra_import.get("alias", import_name)
+        entry[import_alias] = LazyAttribute(extra_import["from"], import_name)
+
+    return entry
+
+
+def _all_subclasses(cls: type) -> list[type]:
+    "every subclass of `cls`, however deep, without walking any modules"
+    found = []
+    seen = set()
+    pending = list(cls.__subclasses__())
+
+    while pending:
+        subclass = pending.pop()
+        if subclass in seen:
+            continue
+        seen.add(subclass)
+        found.append(subclass)
+        pending.extend(subclass.__subclasses__())
+
+    return found
+
+
 def find_all_sqlmodels(module: ModuleType):
-    """Import all model classes from module and submodules into current namespace."""
+    """Import all model classes from module and submodules into current namespace.
+
+    Models are found through `SQLModel.__subclasses__()` and the SQLAlchemy mapper registry, and enums with a single
+    `vars()` scan of each imported submodule, instead of walking the package on disk. Only classes defined under
+    `module` are returned, under the names submodules bind them to. When several submodules bind a name, the one
+    which sorts last wins, even when it only re-exports the class.
+    """
 
     try:
         from sqlmodel import SQLModel  # type: ignore
@@ -155,65 +269,232 @@ def find_all_sqlmodels(module: ModuleType):
     from enum import Enum
 
     log.debug(f"Starting model import from module: {module.__name__}")
-    model_classes = {}
 
-    # Walk through all submodules
-    for _loader, module_name, _is_pkg in pkgutil.walk_packages(module.__path__):
-        full_name = f"{module.__name__}.{module_name}"
-        log.debug(f"Importing submodule: {full_name}")
+    package = module.__name__
+    prefix = f"{package}."
+
+    def in_package(module_name: str) -> bool:
+        return module_name == package or module_name.startswith(prefix)
+
+    candidates: set[type] = {
+        cls for cls in _all_subclasses(SQLModel) if in_package(cls.__module__)
+    }
+
+    # table models are also in the mapper registry, this catches any that are only mapped
+    registry = getattr(SQLModel, "_sa_registry", None)
+    for mapper in getattr(registry, "mappers", ()):
+        if in_package(mapper.class_.__module__):
+            candidates.add(mapper.class_)
+
+    def is_enum(obj) -> bool:
+        return issubclass(obj, Enum) and obj is not Enum and in_package(obj.__module__)
 
-        # Check if module is already imported
-        if full_name in sys.modules:
-            submodule = sys.modules[full_name]
-        else:
-            log.warning(f"Module not found in sys.modules, not importing: {full_name}")
+    model_classes = {}
+    # only already imported submodules are scanned, nothing is imported here. Sorted names are the order a package
+    # walk visits them in, a name bound by several submodules, re-exports included, goes to the last one's class
+    for module_name in sorted(name for name in sys.modules if name.startswith(prefix)):
+        submodule = sys.modules[module_name]
+        if submodule is None:
             continue
 
-        # Get all classes from module
-        for name, obj in inspect.getmembers(submodule):
-            if inspect.isclass(obj):
-                if issubclass(obj, SQLModel) and obj != SQLModel:
-                    log.debug(f"Found model class: {name}")
-                    model_classes[name] = obj
-                elif issubclass(obj, Enum) and obj != Enum:
-                    log.debug(f"Found enum class: {name}")
-                    model_classes[name] = obj
+        for name, obj in vars(submodule).items():
+            if isinstance(obj, type) and (obj in candidates or is_enum(obj)):
+                model_classes[name] = obj
 
     log.debug(f"Completed model import. Found {len(model_classes)} models")
     return model_classes
 
 
-def all(*, database_url: str | None = None):
+class ModelInjector:
+    """Adds the models of a background `app.models` import to the namespace before the first cell after it finishes.
+
+    The prompt doesn't wait on the import. A cell naming something the namespace doesn't have yet is most likely using
+    a model, so it waits for the import instead of raising NameError.
+    """
+
+    def __init__(self, app_models: LazyModule, namespace: dict):
+        self.app_models = app_models
+        self.namespace = namespace
+        self.injected = False
+
+    def _finished(self) -> bool:
+        return self.app_models.is_loaded or self.app_models.load_error is not None
+
+    def _names_missing(self, source: str) -> bool:
+        return any(
+            name not in self.namespace
+            and not hasattr(builtins, name)
+            and not keyword.iskeyword(name)
+            for name in re.findall(r"[A-Za-z_]\w*", source)
+        )
+
+    def pre_run_cell(self, info=None) -> bool:
+        """Returns whether models were added."""
+
+        if self.injected:
+            return False
+
+        if not self._finished() and not self._names_missing(
+            getattr(info, "raw_cell", None) or ""
+        ):
+            return False
+
+        self.injected = True
+        app_models = wait_until_loaded(self.app_models)
+        if app_models is None:
+            # listed under Import Errors by output()
+            return False
+
+        # names the session defined in the meantime, and the database helpers, win like they do at startup
+        for name, model in find_all_sqlmodels(app_models).items():
+            self.namespace.setdefault(name, model)
+
+        return True
+
+
+def inject_models_when_loaded(app_models: LazyModule) -> ModelInjector | None:
+    """Add the models of `app_models` to the namespace once its background import finishes. Returns None outside of
+    IPython, where the caller has to wait on the import instead.
+    """
+
+    try:
+        from IPython import get_ipython  # type: ignore
+    except ImportError:
+        return None
+
+    ipython = get_ipython()
+    if ipython is None:
+        return None
+
+    injector = ModelInjector(app_models, ipython.user_ns)
+    ipython.events.register("pre_run_cell", injector.pre_run_cell)
+    return injector
+
+
+def all(
+    *,
+    database_url: str | None = None,
+    pool: PoolConfig = None,
+    lazy_imports: bool = False,
+    background_imports: bool = False,
+    model_index: bool = False,
+    cell_stats: bool = False,
+    detect_n_plus_one: bool = False,
+    background_connect: bool = False,
+    async_database: bool = False,
+    query_cache: bool | dict = False,
+    guarded: bool | dict = False,
+    watch_identity_map: bool | int = False,
+):
+    """Build the namespace injected into the playground.
+
+    Args:
+        database_url: database to connect to, defaults to the app's configured database
+        pool: connection pool options, a `PoolOptions` or a dict of its fields (size, max_overflow, pre_ping, recycle,
+              timeout). Engines are cached by URL and pool options.
+        lazy_imports: inject lazy proxies for the default imports, see `load_modules_for_ipython`
+        background_imports: import app modules and default imports on a worker pool. Under IPython, models are added
+                            before the first cell after `app.models` finishes importing
+        model_index: inject models and enums from the on-disk index in `.ipython_playground/cache` as lazy
+                     references, only importing the model modules a session uses
+        cell_stats: print wall time, CPU time, SQL statements, DB time and peak memory growth after every IPython cell
+        detect_n_plus_one: warn when the same query shape runs more than `n_plus_one.DEFAULT_THRESHOLD` times in a cell
+        background_connect: open the first database connection on a worker thread, `engine` and `session` wait for
+                            it on first use. Connection failures are logged instead of holding up the prompt.
+        async_database: also set up `async_engine`, `async_session` and the `asa_run`, `asa_stream` and `asa_gather`
+                        coroutines for IPython's top-level await
+        query_cache: cache `sa_run` results, True or a dict of `result_cache.ResultCache` options (ttl, max_entries,
+                     max_bytes, spill)
+        guarded: make `sa_run` add a LIMIT to unbounded selects, refuse plans over a cost threshold and time out
+                 statements. True or a dict of `guard.GuardOptions` fields (max_cost, timeout)
+        watch_identity_map: warn after a cell when the session holds more than `identity_map.DEFAULT_THRESHOLD`
+                            objects, or pass the threshold
+    """
     from enum import Enum
 
     # Patch Enum display for cleaner output in IPython
     Enum.__repr__ = lambda self: f"{self.__class__.__name__}.{self.name}"
 
     from . import utils
+    from .cells import register_cell_stats
     from .database import get_database_url, setup_database_session
+    from .identity_map import DEFAULT_THRESHOLD, register_identity_map_monitor
+    from .model_index import lazy_sqlmodels, register_materialize_hook
+    from .n_plus_one import register_n_plus_one_detector
     from .redis import setup_redis
 
-    modules = load_modules_for_ipython()
+    timings.clear()
 
-    # Add all utility functions from utils module
-    for name, obj in inspect.getmembers(utils):
-        if (
-            inspect.isfunction(obj)
-            and getattr(obj, "__module__", None) == utils.__name__
-            and not name.startswith("_")
-        ):
-            modules[name] = obj
+    with timed("load_modules_for_ipython"):
+        modules = load_modules_for_ipython(
+            lazy=lazy_imports,
+            background=background_imports,
+            # models come from the index, importing app.models up front would defeat it
+            lazy_app_modules=model_index,
+        )
 
-    if "app.models" in modules:
-        modules = modules | find_all_sqlmodels(modules["app.models"])
+    # Add all utility functions from utils module
+    with timed("utils"):
+        for name, obj in inspect.getmembers(utils):
+            if (
+                inspect.isfunction(obj)
+                and getattr(obj, "__module__", None) == utils.__name__
+                and not name.startswith("_")
+            ):
+                modules[name] = obj
+
+    if model_index:
+        with timed("lazy_sqlmodels"):
+            modules = modules | lazy_sqlmodels("app.models")
+
+        register_materialize_hook()
+    elif (
+        background_imports
+        and is_unloaded(modules.get("app.models"))
+        and inject_models_when_loaded(modules["app.models"])
+    ):
+        # models are added before the first cell once the import finishes
+        pass
+    elif "app.models" in modules:
+        # model discovery needs the real module, outside of IPython this waits on the background import
+        with timed("wait for app.models"):
+            app_models = wait_until_loaded(modules["app.models"])
+
+        if app_models is not None:
+            with timed("find_all_sqlmodels"):
+                modules = modules | find_all_sqlmodels(app_models)
 
     if not database_url:
-        database_url = get_database_url()
+        with timed("get_database_url"):
+            database_url = get_database_url()
 
     if database_url:
-        modules = modules | setup_database_session(database_url)
+        with timed("setup_database_session"):
+            modules = modules | setup_database_session(
+                database_url,
+                pool=pool,
+                background=background_connect,
+                asynchronous=async_database,
+                query_cache=query_cache,
+                guarded=guarded,
+            )
+
+        if detect_n_plus_one:
+            # event listeners need the real engine, not the background_connect handle
+            register_n_plus_one_detector(unwrap(modules["engine"]))
+
+        if watch_identity_map:
+            register_identity_map_monitor(
+                unwrap(modules["session"]),
+                # bool is an int, True means the default
+                DEFAULT_THRESHOLD if watch_identity_map is True else watch_identity_map,
+            )
 
     # Add redis client if available
-    modules = modules | setup_redis()
+    with timed("setup_redis"):
+        modules = modules | setup_redis()
+
+    if cell_stats:
+        register_cell_stats()
 
     return modules
@@ -0,0 +1,193 @@
+"""
+Guarded execution for `sa_run`, so a careless query against a production replica can't do much damage.
+
+With a guard enabled, `sa_run`:
+
+- adds `LIMIT max_rows + 1` to selects which have no limit, so the database stops where the row cap would anyway
+- asks the database for the plan's estimated cost first and refuses statements over `max_cost`, unless forced
+- runs the statement under a timeout, where the dialect supports one
+
+Dialects without a cost model (SQLite) skip the cost check, dialects without a way to time out a single statement
+run without one. Plain `text()` statements are never rewritten.
+"""
+
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import Any
+
+from .logger import log
+
+
+@dataclass
+class GuardOptions:
+    max_cost: float | None = 100_000.0
+    "highest estimated plan cost, in the database's own units, allowed without `force=True`. None skips EXPLAIN"
+    timeout: float | None = 30.0
+    "seconds a statement may run, None for no timeout"
+
+
+class QueryRefused(Exception):
+    def __init__(self, cost: float, max_cost: float, sql: str):
+        self.cost = cost
+        self.max_cost = max_cost
+        self.sql = sql
+        super().__init__(
+            f"Estimated cost {cost:,.0f} is over the guard's limit of {max_cost:,.0f}, "
+            "pass force=True to run it anyway"
+        )
+
+
+def _driver_sql(connection, stmt) -> tuple[str, Any]:
+    "the SQL and parameters the driver would be sent for `stmt`, for statements executed with exec_driver_sql"
+
+    compiled = stmt.compile(dialect=connection.dialect)
+    # expanding IN parameters are rendered as placeholders the driver understands
+    expanded = compiled.construct_expanded_state(escape_names=False)
+
+    # values go through the column types' bind processing like an executed statement's would, drivers can't adapt
+    # enum members, dicts for JSON or TypeDecorator values. No public accessor for the unexpanded ones' processors
+    processors = {**compiled._bind_processors, **expanded.processors}
+    params = {
+        key: processors[key](value) if key in processors else value
+        for key, value in expanded.parameters.items()
+    }
+
+    if compiled.positional:
+        return expanded.statement, tuple(params[key] for key in expanded.positiontup)
+
+    escaped = compiled.escaped_bind_names
+    return expanded.statement, {
+        escaped.get(key, key): value for key, value in params.items()
+    }
+
+
+def _postgresql_cost(connection, sql: str, params) -> float | None:
+    (plan,) = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", params).one()
+    return float(plan[0]["Plan"]["Total Cost"])
+
+
+def _mysql_cost(connection, sql: str, params) -> float | None:
+    import json
+
+    (plan,) = connection.exec_driver_sql(f"EXPLAIN FORMAT=JSON {sql}", params).one()
+    return float(json.loads(plan)["query_block"]["cost_info"]["query_cost"])
+
+
+COST_ESTIMATORS: dict[str, Callable[[Any, str, Any], float | None]] = {
+    "postgresql": _postgresql_cost,
+    "mysql": _mysql_cost,
+    "mariadb": _mysql_cost,
+}
+"dialect name -> function returning the estimated cost of a statement"
+
+
+def estimate_cost(connection, stmt) -> float | None:
+    """Estimated cost of `stmt` from the database's planner, None when the dialect has no cost model."""
+
+    estimator = COST_ESTIMATORS.get(connection.dialect.name)
+    if estimator is None:
+        return None
+
+    sql, params = _driver_sql(connection, stmt)
+    return estimator(connection, sql, params)
+
+
+@contextmanager
+def _postgresql_timeout(connection, seconds: float) -> Iterator[None]:
+    # SET LOCAL lasts until the end of the transaction, reset it so later statements in it aren't limited
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(seconds * 1000)}")
+    yield
+    # only on success: a failed statement aborts the transaction, any further statement would raise
+    # InFailedSqlTransaction and hide the real error, and the rollback discards the setting anyway
+    connection.exec_driver_sql("SET LOCAL statement_timeout = DEFAULT")
+
+
+@contextmanager
+def _sqlite_timeout(connection, seconds: float) -> Iterator[None]:
+    # SQLite has no statement timeout, a progress handler returning True interrupts the running statement
+    driver_connection = connection.connection.driver_connection
+    deadline = time.monotonic() + seconds
+
+    driver_connection.set_progress_handler(lambda: time.monotonic() > deadline, 1_000)
+    try:
+        yield
+    finally:
+        driver_connection.set_progress_handler(None, 0)
+
+
+STATEMENT_TIMEOUTS: dict[str, Callable[[Any, float], Any]] = {
+    "postgresql": _postgresql_timeout,
+    "sqlite": _sqlite_timeout,
+}
+"dialect name -> context manager limiting how long statements run on a connection, see `apply_guard` for MySQL"
+
+
+def statement_timeout(connection, seconds: float | None):
+    timeout = STATEMENT_TIMEOUTS.get(connection.dialect.name)
+    if seconds is None or timeout is None:
+        return nullcontext()
+    return timeout(connection, seconds)
+
+
+def apply_guard(stmt, dialect_name: str, options: GuardOptions, max_rows: int | None):
+    """Rewrite `stmt`: add a limit to unbounded selects and MySQL's per-statement timeout hint."""
+    from sqlalchemy import Select  # type: ignore
+
+    if not isinstance(stmt, Select):
+        return stmt
+
+    # no public accessor for an existing limit
+    if max_rows is not None and getattr(stmt, "_limit_clause", None) is None:
+        stmt = stmt.limit(max_rows + 1)
+
+    if options.timeout is not None and dialect_name in ("mysql", "mariadb"):
+        hint = f"/*+ MAX_EXECUTION_TIME({int(options.timeout * 1000)}) */"
+        stmt = stmt.prefix_with(hint, dialect=dialect_name)
+
+    return stmt
+
+
+def guarded_run(
+    session,
+    stmt,
+    run: Callable[[Any], Any],
+    options: GuardOptions,
+    *,
+    max_rows: int | None,
+    force: bool = False,
+) -> Any:
+    """Apply the guard to `stmt` and call `run` with the rewritten statement. Raises `QueryRefused`."""
+
+    # the session executes on this same connection, so the timeout applies to it
+    connection = session.connection()
+    stmt = apply_guard(stmt, connection.dialect.name, options, max_rows)
+
+    if not force and options.max_cost is not None:
+        cost = estimate_cost(connection, stmt)
+        if cost is not None:
+            log.debug(
+                f"Estimated cost {cost:,.0f}, guard limit {options.max_cost:,.0f}"
+            )
+            if cost > options.max_cost:
+                raise QueryRefused(cost, options.max_cost, str(stmt))
+
+    with statement_timeout(connection, options.timeout):
+        return run(stmt)
+
+
+options: GuardOptions | None = None
+"the guard `sa_run` uses, None when guarded execution wasn't enabled"
+
+
+def configure(guard: bool | dict[str, Any]) -> GuardOptions | None:
+    """Enable guarded execution, `guard` is True or a dict of `GuardOptions` fields. False disables it."""
+    global options
+
+    if guard is False:
+        options = None
+    else:
+        options = GuardOptions(**(guard if isinstance(guard, dict) else {}))
+
+    return options
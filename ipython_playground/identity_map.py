@@ -0,0 +1,221 @@
+"""
+Keep the long-lived playground session's identity map from growing without bound.
+
+The session `setup_database_session` opens lasts for the whole REPL. Its identity map only holds objects weakly,
+but IPython keeps every cell's result in `Out` and `_`, so after a few large queries it can hold on to hundreds of
+thousands of ORM objects. This module:
+
+- reports identity map size and estimated memory per model class (`sa_identity_map()`)
+- warns after an IPython cell when the identity map crosses a threshold
+- expunges unchanged objects, or resets the session, while keeping it usable (`sa_expunge()`, `sa_reset_session()`)
+- iterates over large results read-only, expunging each chunk once the next one is fetched (`sa_iterate()`)
+"""
+
+import sys
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from rich.console import Console
+from rich.table import Table
+
+from .logger import log
+from .sizing import SizeEstimate, deep_sizeof
+
+DEFAULT_THRESHOLD = 50_000
+"objects the identity map may hold before a warning is logged"
+
+SAMPLE_SIZE = 20
+"instances per class which are sized, the rest are assumed to be the same size"
+
+ITERATION_CHUNK_SIZE = 1_000
+
+
+@dataclass
+class ClassUsage:
+    model: type
+    count: int
+    memory: SizeEstimate
+    "estimated from a sample of instances, column values only. Related objects are counted under their own class"
+
+
+def _instance_size(instance) -> int:
+    from sqlalchemy import inspect  # type: ignore
+
+    state = inspect(instance)
+    # only loaded column values, following relationships or the instance state would size the whole session
+    columns = state.mapper.column_attrs.keys()
+    values = [value for key, value in state.dict.items() if key in columns]
+    return sys.getsizeof(instance) + sys.getsizeof(state) + deep_sizeof(values).bytes
+
+
+def identity_map_usage(session, *, sample_size: int = SAMPLE_SIZE) -> list[ClassUsage]:
+    """Objects in `session`'s identity map and their estimated memory per class, heaviest first."""
+
+    by_class: defaultdict[type, list] = defaultdict(list)
+    for instance in session.identity_map.values():
+        by_class[type(instance)].append(instance)
+
+    usage = []
+    for model, instances in by_class.items():
+        sample = instances[:sample_size]
+        average = sum(_instance_size(instance) for instance in sample) / len(sample)
+        memory = SizeEstimate(
+            int(average * len(instances)), len(instances) > len(sample)
+        )
+        usage.append(ClassUsage(model, len(instances), memory))
+
+    usage.sort(key=lambda entry: entry.memory.bytes, reverse=True)
+    return usage
+
+
+def show_identity_map(session) -> None:
+    """Print the identity map's size per model class."""
+
+    table = Table("model", "objects", "memory")
+    for entry in identity_map_usage(session):
+        table.add_row(entry.model.__name__, f"{entry.count:,}", str(entry.memory))
+
+    Console().print(table)
+
+
+def expunge(session, *models: type) -> int:
+    """Expunge the unmodified objects of `models`, or of every class, from `session`. Returns how many were expunged.
+
+    Modified objects and objects marked with `session.delete()` stay, so their changes are still flushed. Pending (new)
+    objects aren't in the identity map.
+    """
+    from sqlalchemy import inspect  # type: ignore
+
+    # a pending delete doesn't mark the object modified
+    deleted = session.deleted
+    expunged = 0
+    # copied, expunging changes the identity map
+    for instance in list(session.identity_map.values()):
+        if models and not isinstance(instance, models):
+            continue
+        if inspect(instance).modified or instance in deleted:
+            continue
+
+        session.expunge(instance)
+        expunged += 1
+
+    return expunged
+
+
+def reset_session(session) -> int:
+    """Close `session`, expunging everything and releasing its connection. The session can be used again right away.
+
+    Unflushed changes are discarded, with a warning. Returns how many objects were in the identity map.
+    """
+
+    discarded = len(session.new) + len(session.dirty) + len(session.deleted)
+    if discarded:
+        log.warning(f"Discarding {discarded} unflushed changes")
+
+    count = len(session.identity_map)
+    session.close()
+    return count
+
+
+@contextmanager
+def read_only_iteration(
+    session, stmt, *, chunk_size: int = ITERATION_CHUNK_SIZE
+) -> Iterator[Iterator]:
+    """Stream the rows of `stmt`, expunging the objects each chunk loaded before fetching the next one.
+
+        with sa_iterate(select(User)) as rows:
+            for (user,) in rows:
+                ...
+
+    Only objects loaded by the iteration are expunged, ones the session already held stay. Objects are detached
+    once their chunk is done, keep what you need as plain values. Changes made to them are never flushed.
+    """
+    from sqlalchemy import event  # type: ignore
+
+    loaded: list = []
+
+    def on_load(session, instance):
+        loaded.append(instance)
+
+    def expunge_loaded():
+        for instance in loaded:
+            # a relationship may load the same object twice, or the caller may have expunged it already
+            if instance in session:
+                session.expunge(instance)
+        loaded.clear()
+
+    def rows() -> Iterator:
+        for partition in result.partitions():
+            yield from partition
+            expunge_loaded()
+
+    event.listen(session, "loaded_as_persistent", on_load)
+    try:
+        # flushing half way through would write changes made to objects which are about to be detached
+        with session.no_autoflush:
+            result = session.execute(
+                stmt,
+                execution_options={"yield_per": chunk_size, "stream_results": True},
+            )
+            try:
+                yield rows()
+            finally:
+                result.close()
+    finally:
+        event.remove(session, "loaded_as_persistent", on_load)
+        # the last chunk, or whatever was loaded before the caller stopped early
+        expunge_loaded()
+
+
+class IdentityMapMonitor:
+    """Warns after an IPython cell when the session's identity map holds more than `threshold` objects."""
+
+    def __init__(self, session, threshold: int = DEFAULT_THRESHOLD):
+        self.session = session
+        self.threshold = threshold
+        self.warned = False
+
+    def post_run_cell(self, result=None) -> bool:
+        """Returns whether a warning was logged."""
+
+        # len() is cheap, the per-class breakdown is only built when warning
+        size = len(self.session.identity_map)
+        if size <= self.threshold:
+            # warn again the next time it grows past the threshold
+            self.warned = False
+            return False
+
+        if self.warned:
+            return False
+
+        self.warned = True
+        heaviest = ", ".join(
+            f"{entry.model.__name__}: {entry.count:,} ({entry.memory})"
+            for entry in identity_map_usage(self.session)[:3]
+        )
+        log.warning(
+            f"The session holds {size:,} objects ({heaviest}), "
+            "free them with sa_expunge() or sa_reset_session(), or loop over large results with sa_iterate()"
+        )
+        return True
+
+
+def register_identity_map_monitor(
+    session, threshold: int = DEFAULT_THRESHOLD
+) -> IdentityMapMonitor | None:
+    """Check `session`'s identity map after every IPython cell. Returns None outside of IPython."""
+
+    try:
+        from IPython import get_ipython  # type: ignore
+    except ImportError:
+        return None
+
+    ipython = get_ipython()
+    if ipython is None:
+        return None
+
+    monitor = IdentityMapMonitor(session, threshold)
+    ipython.events.register("post_run_cell", monitor.post_run_cell)
+    return monitor
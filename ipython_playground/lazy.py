@@ -0,0 +1,239 @@
+"""
+Lazy stand-ins for modules, `from module import name` entries and objects still being set up in the background.
+
+These are injected into the playground namespace in place of the real objects so the prompt doesn't wait on imports
+that the session may never use. The real import happens on first attribute access, or on a worker pool right away
+when the proxy is warmed.
+"""
+
+import importlib
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from types import ModuleType
+from typing import Any
+
+from .timing import timed
+
+IMPORT_WORKERS = 4
+"number of threads used to warm imports in the background"
+
+import_errors: dict[str, BaseException] = {}
+"failed lazy imports by module name, surfaced by `output()` instead of being logged during startup"
+
+_MISSING = object()
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=IMPORT_WORKERS, thread_name_prefix="ipython-playground-import"
+        )
+
+    return _executor
+
+
+class LazyModule(ModuleType):
+    """Module proxy which imports the real module on first attribute access."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        # write to __dict__ directly, __setattr__ is forwarded to the real module
+        self.__dict__["_lazy_module"] = None
+        self.__dict__["_lazy_future"] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__dict__["_lazy_module"] is not None
+
+    @property
+    def load_error(self) -> BaseException | None:
+        "exception raised by a background import, if it has finished and failed"
+        future: Future | None = self.__dict__["_lazy_future"]
+        if future is None or not future.done():
+            return None
+        return future.exception()
+
+    def _import(self) -> ModuleType:
+        try:
+            with timed(f"import {self.__name__}", kind="import"):
+                module = importlib.import_module(self.__name__)
+        except Exception as e:
+            import_errors[self.__name__] = e
+            raise
+
+        self.__dict__["_lazy_module"] = module
+        return module
+
+    def _load(self) -> ModuleType:
+        module = self.__dict__["_lazy_module"]
+        if module is not None:
+            return module
+
+        # blocks on this one import if it is still running on the worker pool
+        future: Future | None = self.__dict__["_lazy_future"]
+        if future is not None:
+            return future.result()
+
+        return self._import()
+
+    def __getattr__(self, attr: str) -> Any:
+        # only called for attributes missing on the proxy itself, __name__ & friends don't trigger an import
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value: Any) -> None:
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr: str) -> None:
+        delattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        if self.is_loaded:
+            return repr(self._load())
+        return f"<lazy module '{self.__name__}' (not loaded)>"
+
+
+class LazyAttribute:
+    """Proxy for `from module import name` which resolves on first use."""
+
+    __slots__ = ("_lazy_module_name", "_lazy_name", "_lazy_value")
+
+    def __init__(self, module_name: str, name: str):
+        self._lazy_module_name = module_name
+        self._lazy_name = name
+        self._lazy_value = _MISSING
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._lazy_value is not _MISSING
+
+    @property
+    def lazy_path(self) -> str:
+        return f"{self._lazy_module_name}.{self._lazy_name}"
+
+    def _resolve(self) -> Any:
+        if self._lazy_value is _MISSING:
+            module = importlib.import_module(self._lazy_module_name)
+            self._lazy_value = getattr(module, self._lazy_name)
+        return self._lazy_value
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._resolve(), attr)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __getitem__(self, key):
+        return self._resolve()[key]
+
+    def __or__(self, other):
+        return self._resolve() | other
+
+    def __ror__(self, other):
+        return other | self._resolve()
+
+    def __instancecheck__(self, instance) -> bool:
+        return isinstance(instance, self._resolve())
+
+    def __subclasscheck__(self, subclass) -> bool:
+        return issubclass(subclass, self._resolve())
+
+    def __mro_entries__(self, bases):
+        # allows `class User(SQLModel)` when `SQLModel` is still a proxy
+        return (self._resolve(),)
+
+    def __dir__(self):
+        return dir(self._resolve())
+
+    def __repr__(self) -> str:
+        if self.is_loaded:
+            return repr(self._lazy_value)
+        return f"<lazy {self.lazy_path} (not loaded)>"
+
+
+class PendingValue:
+    """Proxy for an object which shouldn't be used until a background task finishes, like warming a connection pool.
+
+    The first use blocks on the task only if it is still running. The task's outcome is ignored, it is expected to
+    report its own failures, and the object is handed out either way.
+    """
+
+    __slots__ = ("_pending_future", "_pending_label", "_pending_value")
+
+    def __init__(self, value: Any, future: Future, label: str):
+        object.__setattr__(self, "_pending_value", value)
+        object.__setattr__(self, "_pending_future", future)
+        object.__setattr__(self, "_pending_label", label)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._pending_future.done()
+
+    @property
+    def __class__(self):  # type: ignore[override]
+        # isinstance(engine, Engine) holds for libraries which check what they are given, pandas.read_sql etc
+        return type(self._pending_value)
+
+    def _resolve(self) -> Any:
+        if not self._pending_future.done():
+            wait([self._pending_future])
+        return self._pending_value
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._resolve(), attr)
+
+    def __setattr__(self, attr: str, value: Any) -> None:
+        setattr(self._resolve(), attr, value)
+
+    def __enter__(self):
+        return self._resolve().__enter__()
+
+    def __exit__(self, *exc_info):
+        return self._resolve().__exit__(*exc_info)
+
+    def __dir__(self):
+        return dir(self._pending_value)
+
+    def __repr__(self) -> str:
+        if self.is_loaded:
+            return repr(self._pending_value)
+        return f"<{self._pending_label} (not ready)>"
+
+
+def warm(proxy: LazyModule) -> LazyModule:
+    """Start importing the module behind `proxy` on the worker pool and return the proxy."""
+    proxy.__dict__["_lazy_future"] = _get_executor().submit(proxy._import)
+    return proxy
+
+
+def wait_until_loaded(obj: Any) -> Any:
+    """Block until a lazy module is imported and return the real module, or None if the import failed.
+
+    Anything that isn't a lazy module is returned as-is.
+    """
+    if not isinstance(obj, LazyModule):
+        return obj
+
+    try:
+        return obj._load()
+    except Exception:  # noqa: BLE001 - already recorded in import_errors
+        return None
+
+
+def is_unloaded(obj: Any) -> bool:
+    """True if `obj` is a lazy proxy which hasn't been imported yet. Never triggers an import."""
+    return isinstance(obj, LazyModule | LazyAttribute) and not obj.is_loaded
+
+
+def unwrap(obj: Any) -> Any:
+    """Return the real object behind a loaded lazy proxy, or `obj` itself."""
+    if type(obj) is PendingValue:
+        # the object exists already, only its background setup may still be running
+        return obj._pending_value
+    if isinstance(obj, LazyModule | LazyAttribute) and obj.is_loaded:
+        return obj._load() if isinstance(obj, LazyModule) else obj._resolve()
+    return obj
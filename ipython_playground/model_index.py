@@ -0,0 +1,287 @@
+"""
+Persistent index of model and enum names to the modules which define them.
+
+On a warm start the playground injects lazy references from this index instead of importing every model module, and
+only the submodules a session touches are imported. Relationships are resolved by name when mappers are configured,
+so the index also records which modules each module's models have relationships with, and loading a model imports
+those too. The index is invalidated when any source file under the models package is added, removed or changed.
+File mtimes and sizes are checked first, and contents are only hashed when those differ, so touching a file without
+editing it doesn't throw the index away.
+"""
+
+import hashlib
+import importlib
+import importlib.util
+import json
+import pkgutil
+import re
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+from .lazy import LazyAttribute
+from .logger import log
+
+INDEX_VERSION = 2
+CACHE_DIR = Path(".ipython_playground") / "cache"
+"relative to the current working directory, which is the project root when running ./playground.py"
+
+
+def _index_path(package: str) -> Path:
+    return CACHE_DIR / f"models-{package}.json"
+
+
+def _package_dirs(package: str) -> list[Path]:
+    "source directories of `package` without executing it (its parent packages are imported)"
+    try:
+        spec = importlib.util.find_spec(package)
+    except (ImportError, ValueError):
+        return []
+
+    if spec is None or not spec.submodule_search_locations:
+        return []
+
+    return [Path(location) for location in spec.submodule_search_locations]
+
+
+def _source_files(package_dirs: list[Path]) -> list[Path]:
+    return sorted(
+        path for directory in package_dirs for path in directory.rglob("*.py")
+    )
+
+
+def _fingerprint(path: Path) -> dict:
+    stat = path.stat()
+    return {
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "sha256": hashlib.sha256(path.read_bytes()).hexdigest(),
+    }
+
+
+def load_index(package: str) -> dict | None:
+    """Return the cached index for `package`, or None if there isn't one or it is stale.
+
+    `names` maps model and enum names to their modules, `dependencies` maps a module to the modules its models have
+    relationships with.
+    """
+
+    index_path = _index_path(package)
+    try:
+        cached = json.loads(index_path.read_text())
+    except (OSError, ValueError):
+        return None
+
+    if cached.get("version") != INDEX_VERSION:
+        return None
+
+    files: dict[str, dict] = cached["files"]
+    current = _source_files(_package_dirs(package))
+    if sorted(files) != [str(path) for path in current]:
+        log.debug(f"Model index for {package} is stale, files were added or removed")
+        return None
+
+    refreshed = False
+    for path in current:
+        recorded = files[str(path)]
+        stat = path.stat()
+        if stat.st_mtime == recorded["mtime"] and stat.st_size == recorded["size"]:
+            continue
+
+        fingerprint = _fingerprint(path)
+        if fingerprint["sha256"] != recorded["sha256"]:
+            log.debug(f"Model index for {package} is stale, {path} changed")
+            return None
+
+        # touched but not edited, keep the index and remember the new mtime
+        files[str(path)] = fingerprint
+        refreshed = True
+
+    if refreshed:
+        _write_index(index_path, cached)
+
+    return cached
+
+
+def ensure_cache_dir(path: Path = CACHE_DIR) -> Path:
+    """Create `path`, keeping the playground's cache out of version control when it is under `CACHE_DIR`."""
+
+    path.mkdir(parents=True, exist_ok=True)
+
+    gitignore = CACHE_DIR.parent / ".gitignore"
+    if path.is_relative_to(CACHE_DIR) and not gitignore.exists():
+        gitignore.write_text("*\n")
+
+    return path
+
+
+def _write_index(index_path: Path, contents: dict):
+    try:
+        ensure_cache_dir(index_path.parent)
+
+        # write then rename so a crashed session never leaves a half written index
+        tmp_path = index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(contents))
+        tmp_path.replace(index_path)
+    except OSError as e:
+        log.warning(f"Could not write model index to {index_path}: {e}")
+
+
+def _relationship_modules(model_classes: dict[str, type]) -> dict[str, list[str]]:
+    "module -> other modules defining models its models have relationships with"
+
+    dependencies: dict[str, set[str]] = {}
+    for cls in model_classes.values():
+        mapper = getattr(cls, "__mapper__", None)
+        if mapper is None:
+            continue
+
+        try:
+            # configures every mapper, which needs all their modules imported
+            relationships = list(mapper.relationships)
+        except Exception as e:  # noqa: BLE001 - a broken mapper shouldn't take down the playground
+            log.warning(f"Could not inspect the relationships of {cls.__name__}: {e}")
+            continue
+
+        for relationship in relationships:
+            related_module = relationship.mapper.class_.__module__
+            if related_module != cls.__module__:
+                dependencies.setdefault(cls.__module__, set()).add(related_module)
+
+    return {module: sorted(related) for module, related in dependencies.items()}
+
+
+def build_index(module: ModuleType) -> dict[str, type]:
+    """Import every submodule of `module`, discover its models and persist the index. Returns the classes."""
+
+    from .extras import find_all_sqlmodels
+
+    # find_all_sqlmodels only sees imported submodules, the index has to cover all of them
+    for module_info in pkgutil.walk_packages(
+        module.__path__, prefix=f"{module.__name__}."
+    ):
+        try:
+            importlib.import_module(module_info.name)
+        except Exception as e:  # noqa: BLE001 - a broken model module shouldn't take down the playground
+            log.warning(
+                f"Could not import {module_info.name} while indexing models: {e}"
+            )
+
+    model_classes = find_all_sqlmodels(module)
+
+    _write_index(
+        _index_path(module.__name__),
+        {
+            "version": INDEX_VERSION,
+            "files": {
+                str(path): _fingerprint(path)
+                for path in _source_files([Path(p) for p in module.__path__])
+            },
+            "names": {name: cls.__module__ for name, cls in model_classes.items()},
+            "dependencies": _relationship_modules(model_classes),
+        },
+    )
+
+    return model_classes
+
+
+class LazyModel(LazyAttribute):
+    """Lazy reference to an indexed model, which also imports the modules of every model it is related to.
+
+    `relationship("Post")` is looked up by name when mappers are configured, on the first query. If the module
+    defining `Post` was never imported that fails, so they are all imported before the model's own module.
+    """
+
+    __slots__ = ("_lazy_dependencies",)
+
+    def __init__(self, module_name: str, name: str, dependencies: dict[str, list[str]]):
+        super().__init__(module_name, name)
+        self._lazy_dependencies = dependencies
+
+    def _related_modules(self) -> list[str]:
+        "modules reachable through relationships, transitively, the model's own module excluded"
+        seen = {self._lazy_module_name}
+        pending = [self._lazy_module_name]
+        while pending:
+            for related in self._lazy_dependencies.get(pending.pop(), ()):
+                if related not in seen:
+                    seen.add(related)
+                    pending.append(related)
+
+        seen.discard(self._lazy_module_name)
+        return sorted(seen)
+
+    def _resolve(self) -> Any:
+        if not self.is_loaded:
+            for module_name in self._related_modules():
+                importlib.import_module(module_name)
+        return super()._resolve()
+
+
+def lazy_sqlmodels(package: str = "app.models") -> dict:
+    """Models and enums of `package`, as lazy references when the on-disk index is fresh.
+
+    On a cold or stale index the package is imported, discovered and indexed, and the real classes are returned.
+    Note that importing any submodule still imports the package `__init__`, so this only pays off when it doesn't
+    import every model itself.
+    """
+
+    index = load_index(package)
+    if index is not None:
+        names = index["names"]
+        log.debug(f"Using model index for {package} with {len(names)} entries")
+        return {
+            name: LazyModel(module_name, name, index["dependencies"])
+            for name, module_name in names.items()
+        }
+
+    try:
+        module = importlib.import_module(package)
+    except ImportError:
+        log.warning(f"Could not import {package}")
+        return {}
+
+    return build_index(module)
+
+
+def materialize_referenced(namespace: dict, source: str) -> list[str]:
+    """Swap lazy references named in `source` for the real objects in `namespace`, returning the swapped names.
+
+    Proxies work for attribute access and calls, but libraries like SQLAlchemy inspect the type of what they are
+    given (`select(User)`), so names are resolved before a cell that mentions them runs.
+    """
+
+    materialized = []
+    for name in set(re.findall(r"[A-Za-z_]\w*", source)):
+        value = namespace.get(name)
+        if not isinstance(value, LazyAttribute):
+            continue
+
+        try:
+            namespace[name] = value._resolve()
+        except Exception as e:  # noqa: BLE001 - the cell will surface the real error when it runs
+            log.warning(f"Could not load {value.lazy_path}: {e}")
+            continue
+
+        materialized.append(name)
+
+    return materialized
+
+
+def register_materialize_hook() -> bool:
+    """Resolve lazy model references before each IPython cell runs. Returns False outside of IPython."""
+
+    try:
+        from IPython import get_ipython  # type: ignore
+    except ImportError:
+        return False
+
+    ipython = get_ipython()
+    if ipython is None:
+        return False
+
+    def pre_run_cell(info):
+        materialize_referenced(ipython.user_ns, info.raw_cell or "")
+
+    ipython.events.register("pre_run_cell", pre_run_cell)
+    return True
@@ -0,0 +1,181 @@
+"""
+Warn when the same query shape runs over and over within a single IPython cell, the usual sign of an N+1.
+
+Statements are grouped by their SQL with literals and `IN` lists collapsed. When a shape crosses the threshold the
+warning includes the line of user code which triggered it and, for lazy relationship loads, the loader option which
+would fetch the relationship up front:
+
+    Query ran 11 times in this cell, from <ipython-input-3>:2 in <module>:
+      SELECT post.id, post.user_id FROM post WHERE ? = post.user_id
+    It lazy loads User.posts, try select(User).options(selectinload(User.posts))
+"""
+
+import functools
+import re
+import sys
+from collections import Counter
+from dataclasses import dataclass
+
+from .logger import log
+
+DEFAULT_THRESHOLD = 10
+"a shape may run this many times in a cell before it is reported"
+
+# frames from these packages are skipped when looking for the code which triggered a query
+_LIBRARY_PREFIXES = (
+    "sqlalchemy",
+    "sqlmodel",
+    "activemodel",
+    "ipython_playground",
+    "IPython",
+    "contextlib",
+)
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+# driver specific placeholders: %(name)s, %s, :name, $1
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\$\d+")
+# expanding IN parameters before the driver sees them, or after SQLAlchemy renders them
+_POSTCOMPILE = re.compile(r"\(?__\[POSTCOMPILE_\w+\]\)?")
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize_sql(statement: str) -> str:
+    """Reduce `statement` to its shape: placeholders for literals and parameters, `IN` lists collapsed."""
+
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _POSTCOMPILE.sub("(?)", shape)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+@dataclass
+class RepeatedQuery:
+    shape: str
+    count: int
+    call_site: str | None
+    "file:line in function of the user code which ran the query when it crossed the threshold"
+    relationship: str | None
+    "`Model.attribute` when the query is a lazy relationship load"
+    suggestion: str | None
+
+
+def _call_site() -> str | None:
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith(_LIBRARY_PREFIXES):
+            code = frame.f_code
+            return f"{code.co_filename}:{frame.f_lineno} in {code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def _lazy_loaded_relationship(context):
+    "relationship property a statement lazy loads, read from the ORM path SQLAlchemy compiled it for"
+
+    compile_state = getattr(getattr(context, "compiled", None), "compile_state", None)
+    path = getattr(getattr(compile_state, "current_path", None), "path", ())
+    prop = path[-1] if path else None
+    return prop if hasattr(prop, "direction") else None
+
+
+def _suggest_loader(prop) -> tuple[str, str]:
+    from sqlalchemy.orm import interfaces  # type: ignore
+
+    model = prop.parent.class_.__name__
+    attribute = f"{model}.{prop.key}"
+
+    # a join per parent row is cheap for a single related object, collections are better fetched in one IN query
+    loader = "joinedload" if prop.direction is interfaces.MANYTOONE else "selectinload"
+    return attribute, f"select({model}).options({loader}({attribute}))"
+
+
+class NPlusOneDetector:
+    """Counts query shapes on the engines it is attached to until `reset()` is called, once per cell."""
+
+    def __init__(self, threshold: int = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.counts: Counter[str] = Counter()
+        self.repeated: dict[str, RepeatedQuery] = {}
+        "shapes which crossed the threshold since the last reset"
+
+    def attach(self, engine) -> None:
+        from sqlalchemy import event  # type: ignore
+
+        if not event.contains(
+            engine, "before_cursor_execute", self._before_cursor_execute
+        ):
+            event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+
+    def detach(self, engine) -> None:
+        from sqlalchemy import event  # type: ignore
+
+        if event.contains(engine, "before_cursor_execute", self._before_cursor_execute):
+            event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+
+    def reset(self, *args) -> None:
+        "accepts and ignores IPython's event arguments so it can be registered as a hook directly"
+        self.counts.clear()
+        self.repeated.clear()
+
+    def _before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        shape = normalize_sql(statement)
+        self.counts[shape] += 1
+        count = self.counts[shape]
+
+        if shape in self.repeated:
+            self.repeated[shape].count = count
+            return
+
+        if count <= self.threshold:
+            return
+
+        # only paid once per shape, walking the stack for every statement would be too slow
+        relationship = suggestion = None
+        if prop := _lazy_loaded_relationship(context):
+            relationship, suggestion = _suggest_loader(prop)
+
+        repeated = RepeatedQuery(shape, count, _call_site(), relationship, suggestion)
+        self.repeated[shape] = repeated
+        self._warn(repeated)
+
+    def _warn(self, repeated: RepeatedQuery):
+        message = f"Query ran {repeated.count} times in this cell"
+        if repeated.call_site:
+            message += f", from {repeated.call_site}"
+        message += f":\n  {repeated.shape}"
+        if repeated.suggestion:
+            message += (
+                f"\nIt lazy loads {repeated.relationship}, try {repeated.suggestion}"
+            )
+
+        log.warning(message)
+
+
+def register_n_plus_one_detector(
+    *engines, threshold: int = DEFAULT_THRESHOLD
+) -> NPlusOneDetector | None:
+    """Watch `engines` for repeated queries, starting over before every IPython cell. Returns None outside of IPython."""
+
+    try:
+        from IPython import get_ipython  # type: ignore
+    except ImportError:
+        return None
+
+    ipython = get_ipython()
+    if ipython is None:
+        return None
+
+    detector = NPlusOneDetector(threshold)
+    for engine in engines:
+        detector.attach(engine)
+
+    ipython.events.register("pre_run_cell", detector.reset)
+    return detector
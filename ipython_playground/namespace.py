@@ -0,0 +1,162 @@
+"""
+Classify an interactive namespace into functions, classes, modules and variables in a single pass.
+
+`output()` renders from this index, and it can be reused to ask narrower questions (only classes matching `User*`,
+etc) without walking the namespace once per section.
+"""
+
+import fnmatch
+import inspect
+import re
+from collections.abc import Collection, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import FunctionType, ModuleType
+from typing import Any
+
+from . import lazy
+
+KINDS = ("functions", "classes", "modules", "variables")
+
+BUILTIN_MODULES = {
+    "os",
+    "sys",
+    "json",
+    "tempfile",
+    "subprocess",
+    "importlib",
+    "pkgutil",
+    "ipython_playground",
+}
+EXCLUDE_VARS = {"In", "Out", "PIPE", "get_ipython", "exit", "quit", "c"}
+EXCLUDE_CLASSES = {"Popen"}
+
+Snapshot = dict[str, tuple[int, str]]
+"name -> (id, type name) of every classified object, cheap to keep around and holds no references"
+
+last_snapshot: Snapshot | None = None
+"snapshot taken by the previous `output()` call, used by `output(since_last=True)`"
+
+
+@dataclass
+class NamespaceIndex:
+    functions: dict[str, Any] = field(default_factory=dict)
+    classes: dict[str, Any] = field(default_factory=dict)
+    modules: dict[str, Any] = field(default_factory=dict)
+    variables: dict[str, Any] = field(default_factory=dict)
+
+    def filter(
+        self,
+        kinds: Iterable[str] | None = None,
+        pattern: str | re.Pattern | None = None,
+        limit: int | None = None,
+        names: Collection[str] | None = None,
+    ) -> "NamespaceIndex":
+        """Narrow the index down without reclassifying anything.
+
+        Args:
+            kinds: sections to keep, any of `KINDS`. Everything is kept when None.
+            pattern: a glob (`User*`) matched against the full name, or a compiled regex which is searched for
+            limit: maximum number of entries kept per section
+            names: only keep these names
+        """
+
+        kinds = KINDS if kinds is None else tuple(kinds)
+        if unknown := set(kinds) - set(KINDS):
+            raise ValueError(f"Unknown kinds {sorted(unknown)}, expected {KINDS}")
+
+        if pattern is None:
+            matches = None
+        elif isinstance(pattern, re.Pattern):
+            matches = pattern.search
+        else:
+            matches = re.compile(fnmatch.translate(pattern)).match
+
+        filtered = NamespaceIndex()
+        for kind in kinds:
+            section = getattr(filtered, kind)
+            for name, obj in getattr(self, kind).items():
+                if limit is not None and len(section) >= limit:
+                    break
+                if names is not None and name not in names:
+                    continue
+                if matches is None or matches(name):
+                    section[name] = obj
+
+        return filtered
+
+
+def classify_namespace(namespace: dict[str, Any]) -> NamespaceIndex:
+    """Sort every public name in `namespace` into a section, checking the type of each object once."""
+
+    ipython_path = Path.home() / ".ipython"
+    index = NamespaceIndex()
+
+    for name, value in namespace.items():
+        if name.startswith("_"):
+            continue
+
+        # loaded proxies are classified as what they point to, unloaded ones are left alone so we don't import them
+        obj = lazy.unwrap(value)
+
+        if isinstance(obj, FunctionType):
+            # Get the source file of the function
+            try:
+                source_file = Path(inspect.getfile(obj))
+            except (TypeError, ValueError):
+                continue
+
+            # Skip if function is from .ipython directory
+            if ipython_path not in source_file.parents:
+                index.functions[name] = obj
+        elif isinstance(obj, type):
+            if name not in EXCLUDE_CLASSES:
+                index.classes[name] = obj
+        elif name in BUILTIN_MODULES or name in EXCLUDE_VARS:
+            continue
+        elif isinstance(obj, ModuleType):
+            index.modules[name] = obj
+        else:
+            index.variables[name] = obj
+
+    return index
+
+
+@dataclass
+class NamespaceDiff:
+    added: set[str]
+    removed: dict[str, str]
+    "removed name -> type name it had"
+    rebound: set[str]
+
+
+def take_snapshot(namespace: dict[str, Any], index: NamespaceIndex) -> Snapshot:
+    """Record the identity of everything in `index` without keeping the objects alive.
+
+    Uses the raw namespace values, so a lazy proxy being imported doesn't look like a rebind. The type name guards
+    against an id being reused by a new object after the old one was garbage collected.
+    """
+
+    snapshot: Snapshot = {}
+    for kind in KINDS:
+        for name in getattr(index, kind):
+            value = namespace[name]
+            snapshot[name] = (id(value), type(value).__qualname__)
+
+    return snapshot
+
+
+def diff_snapshots(previous: Snapshot, current: Snapshot) -> NamespaceDiff:
+    return NamespaceDiff(
+        added=current.keys() - previous.keys(),
+        removed={
+            name: type_name
+            for name, (_, type_name) in previous.items()
+            if name not in current
+        },
+        rebound={
+            name
+            for name, identity in current.items()
+            if name in previous and previous[name] != identity
+        },
+    )
@@ -0,0 +1,174 @@
+"""
+Structured query log for the playground engine, replacing `echo=True`.
+
+Every statement is kept in a bounded ring buffer with its parameters, duration and row count. Drivers only report
+row counts for DML, so for statements returning rows the count is the number of rows `sa_run` and `sa_stream`
+fetched. Nothing is formatted or logged unless echo is switched on, so bulk work in the REPL doesn't pay for it.
+
+    sa_queries.echo = True   # log statements as they run
+    sa_slowest(5)            # slowest recent statements
+"""
+
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+from rich.console import Console
+from rich.table import Table
+
+from .logger import log
+
+DEFAULT_CAPACITY = 1_000
+"statements kept before the oldest are dropped"
+
+ECHO_STATEMENT_LENGTH = 500
+"characters of a statement logged when echo is on"
+
+_START_TIMES_KEY = "ipython_playground_query_start"
+
+
+@dataclass
+class QueryRecord:
+    statement: str
+    parameters: Any
+    "parameters of the statement, only the first set for `executemany` calls"
+    parameter_sets: int
+    "number of parameter sets sent, more than one for `executemany` calls"
+    duration: float
+    "seconds spent in the driver's execute call"
+    rowcount: int | None
+    "rows affected as reported by the driver, or rows fetched through `record_fetched`. None when neither is known"
+
+
+class QueryRecorder:
+    """Records statements executed on the engines it is attached to."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, echo: bool = False):
+        self.records: deque[QueryRecord] = deque(maxlen=capacity)
+        self.echo = echo
+        self.statement_count = 0
+        "statements recorded since the recorder was created, unlike `records` this is never trimmed"
+        self.total_duration = 0.0
+        self._engines: weakref.WeakSet = weakref.WeakSet()
+        # execution context -> record of a statement returning rows, until its rows are counted
+        self._unfetched: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def attach(self, engine) -> None:
+        """Start recording statements run on `engine`. Attaching the same engine twice is a no-op."""
+        from sqlalchemy import event  # type: ignore
+
+        if engine in self._engines:
+            return
+
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+        self._engines.add(engine)
+
+    def detach(self, engine) -> None:
+        from sqlalchemy import event  # type: ignore
+
+        if engine not in self._engines:
+            return
+
+        event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.remove(engine, "handle_error", self._handle_error)
+        self._engines.discard(engine)
+
+    def clear(self) -> None:
+        self.records.clear()
+
+    def slowest(self, limit: int = 10) -> list[QueryRecord]:
+        """Recorded statements ordered by duration, slowest first."""
+        return sorted(self.records, key=lambda r: r.duration, reverse=True)[:limit]
+
+    def _before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        # a stack since a listener on one connection can execute more statements before the first one finishes
+        conn.info.setdefault(_START_TIMES_KEY, []).append(time.perf_counter())
+
+    def _after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        duration = time.perf_counter() - conn.info[_START_TIMES_KEY].pop()
+
+        # keeping every parameter set of a bulk insert alive would defeat the point of a bounded buffer
+        if executemany:
+            parameter_sets = len(parameters)
+            parameters = parameters[0] if parameters else None
+        else:
+            parameter_sets = 1
+
+        # -1 when the driver doesn't know, which is most SELECTs and every server-side cursor
+        rowcount = cursor.rowcount if cursor.rowcount >= 0 else None
+        record = QueryRecord(statement, parameters, parameter_sets, duration, rowcount)
+        if rowcount is None and cursor.description is not None and context is not None:
+            self._unfetched[context] = record
+
+        self.records.append(record)
+        self.statement_count += 1
+        self.total_duration += duration
+
+        if self.echo:
+            log.info(
+                f"[{duration * 1000:.1f}ms, {'?' if rowcount is None else rowcount} rows] {statement[:ECHO_STATEMENT_LENGTH]} {parameters!r}"
+            )
+
+    def record_fetched(self, result, rows: int) -> None:
+        """Set the row count of the statement behind `result` to the `rows` fetched from it, unless the driver knew."""
+
+        # ORM results wrap the cursor result of the statement
+        context = getattr(getattr(result, "raw", result), "context", None)
+        if context is None:
+            return
+
+        record = self._unfetched.pop(context, None)
+        if record is not None:
+            record.rowcount = rows
+
+    def _handle_error(self, context):
+        # after_cursor_execute isn't called for a failed statement, drop its start time
+        start_times = (
+            context.connection.info.get(_START_TIMES_KEY)
+            if context.connection
+            else None
+        )
+        if start_times:
+            start_times.pop()
+
+
+recorder = QueryRecorder()
+"records every engine set up by the playground"
+
+
+def set_echo(enabled: bool = True) -> None:
+    """Log each statement as it runs, without recreating the engine."""
+    recorder.echo = enabled
+
+
+def slowest(limit: int = 10) -> list[QueryRecord]:
+    return recorder.slowest(limit)
+
+
+def show_slowest(limit: int = 10) -> None:
+    """Print the slowest `limit` recent statements."""
+
+    table = Table("ms", "rows", "statement", "parameters")
+    for record in recorder.slowest(limit):
+        statement = " ".join(record.statement.split())
+        parameters = repr(record.parameters)
+        if record.parameter_sets > 1:
+            parameters += f" (x{record.parameter_sets})"
+
+        table.add_row(
+            f"{record.duration * 1000:.1f}",
+            "?" if record.rowcount is None else str(record.rowcount),
+            statement,
+            parameters,
+        )
+
+    Console().print(table)
@@ -0,0 +1,266 @@
+"""
+Opt-in cache of `sa_run` results, so rerunning an expensive query while exploring doesn't hit the database again.
+
+Results are keyed by the database URL, the compiled SQL and its bound parameters, and expire after a TTL. The cache
+is bounded by entry count and by an estimate of the memory results hold on to, least recently used entries are
+evicted first. With `spill=True` results are also written to `.ipython_playground/cache/results` and survive
+restarting the playground.
+
+Only selects are cached. Caching an INSERT ... RETURNING would replay its rows without running it again, and `text()`
+statements are only cached when the caller says they read (`sa_run(stmt, cache=True)`), since their SQL isn't
+inspected. Every call gets its own copy of the cached list, array or DataFrame, so mutating a result doesn't change
+what the next call gets. ORM instances in results are shared and detached, and not refreshed.
+"""
+
+import copy
+import hashlib
+import pickle
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .logger import log
+from .model_index import CACHE_DIR, ensure_cache_dir
+from .sizing import deep_sizeof
+
+DEFAULT_TTL = 300.0
+"seconds a result is served from the cache"
+
+DEFAULT_MAX_ENTRIES = 128
+DEFAULT_MAX_BYTES = 256 * 1024**2
+"estimated memory held by cached results, also the bound on the disk cache"
+
+SPILL_DIR = CACHE_DIR / "results"
+
+
+@dataclass
+class CacheEntry:
+    sql: str
+    value: Any
+    size: int
+    expires: float
+    "wall clock time, so entries loaded from disk expire when they would have in the session which wrote them"
+
+
+def is_cacheable(stmt, *, text: bool = False) -> bool:
+    """Whether the result of `stmt` can be cached: selects, and `text()` statements when `text` is set."""
+    from sqlalchemy import TextClause  # type: ignore
+
+    # insert/update/delete, with or without RETURNING, have to run every time
+    if getattr(stmt, "is_select", False):
+        return True
+    return text and isinstance(stmt, TextClause)
+
+
+def _copy_result(value: Any) -> Any:
+    "a copy of a cached result which can be mutated without changing the cache, rows themselves are immutable"
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        # columns of `as_="numpy"`, copying an array copies its data
+        return {key: copy.copy(column) for key, column in value.items()}
+    # DataFrames copy their data, Arrow tables are immutable and return themselves
+    return copy.copy(value)
+
+
+def cache_key(session, stmt, *extra) -> tuple[str, str]:
+    """(key, sql) for `stmt` run through `session`. `extra` distinguishes different shapes of the same result."""
+
+    bind = session.get_bind()
+    compiled = stmt.compile(dialect=bind.dialect)
+    sql = str(compiled)
+
+    identity = repr(
+        (
+            # credentials don't change what a query returns, rotating them shouldn't empty the cache
+            bind.url.render_as_string(hide_password=True),
+            sql,
+            sorted(compiled.params.items()),
+            extra,
+        )
+    )
+    return hashlib.sha256(identity.encode()).hexdigest(), sql
+
+
+class ResultCache:
+    def __init__(
+        self,
+        *,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        spill: bool = False,
+        spill_dir: Path = SPILL_DIR,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir if spill else None
+
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        "hits served from the spill directory, included in `hits`"
+        self.evictions = 0
+
+    def get_or_run(self, key: str, sql: str, run: Callable[[], Any]) -> Any:
+        """Return the cached result for `key`, or call `run` and cache what it returns."""
+
+        entry = self._get(key)
+        if entry is not None:
+            self.hits += 1
+            return _copy_result(entry.value)
+
+        self.misses += 1
+        value = run()
+        self._put(key, CacheEntry(sql, value, 0, time.time() + self.ttl))
+        return _copy_result(value)
+
+    def _get(self, key: str) -> CacheEntry | None:
+        entry = self.entries.get(key)
+        from_disk = entry is None and self.spill_dir is not None
+        if from_disk:
+            entry = self._load(key)
+
+        if entry is None:
+            return None
+
+        if entry.expires <= time.time():
+            self._remove(key)
+            return None
+
+        if from_disk:
+            self.disk_hits += 1
+            self._put(key, entry, write=False)
+        else:
+            self.entries.move_to_end(key)
+
+        return entry
+
+    def _put(self, key: str, entry: CacheEntry, write: bool = True):
+        entry.size = deep_sizeof(entry.value).bytes
+        if entry.size > self.max_bytes:
+            log.debug(f"Not caching a {entry.size} byte result, over the cache limit")
+            return
+
+        if key in self.entries:
+            self.size -= self.entries.pop(key).size
+
+        self.entries[key] = entry
+        self.size += entry.size
+
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.size
+            self.evictions += 1
+
+        if write and self.spill_dir is not None:
+            self._write(key, entry)
+
+    def _remove(self, key: str):
+        if (entry := self.entries.pop(key, None)) is not None:
+            self.size -= entry.size
+
+        if self.spill_dir is not None:
+            (self.spill_dir / f"{key}.pickle").unlink(missing_ok=True)
+
+    def _load(self, key: str) -> CacheEntry | None:
+        path = self.spill_dir / f"{key}.pickle"  # type: ignore[operator]
+        try:
+            # only ever written by _write below, in the project's own cache directory
+            return pickle.loads(path.read_bytes())
+        except FileNotFoundError:
+            return None
+        except Exception as e:  # noqa: BLE001 - a stale or truncated file is just a miss
+            log.debug(f"Could not load cached result {path}: {e}")
+            return None
+
+    def _write(self, key: str, entry: CacheEntry):
+        try:
+            data = pickle.dumps(entry)
+        except Exception as e:  # noqa: BLE001 - not every result pickles, it is still cached in memory
+            log.debug(f"Not spilling result of {entry.sql!r} to disk: {e}")
+            return
+
+        try:
+            path = ensure_cache_dir(self.spill_dir) / f"{key}.pickle"  # type: ignore[arg-type]
+            # write then rename so a crashed session never leaves a half written result
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(data)
+            tmp_path.replace(path)
+            self._prune_disk()
+        except OSError as e:
+            log.warning(f"Could not write cached result to {self.spill_dir}: {e}")
+
+    def _prune_disk(self):
+        files = sorted(self.spill_dir.glob("*.pickle"), key=lambda p: p.stat().st_mtime)  # type: ignore[union-attr]
+        total = sum(path.stat().st_size for path in files)
+
+        for path in files:
+            if total <= self.max_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+
+    def invalidate(self, pattern: str | None = None) -> int:
+        """Drop cached results whose SQL contains `pattern` (a table name, say), or everything when None.
+
+        Returns the number of entries dropped from memory and disk.
+        """
+
+        keys = {
+            key
+            for key, entry in self.entries.items()
+            if pattern is None or pattern in entry.sql
+        }
+
+        if self.spill_dir is not None:
+            for path in self.spill_dir.glob("*.pickle"):
+                key = path.stem
+                if key in self.entries:
+                    continue
+                # results of earlier sessions are only on disk, load them to check their SQL
+                if pattern is None or (
+                    (entry := self._load(key)) and pattern in entry.sql
+                ):
+                    keys.add(key)
+
+        for key in keys:
+            self._remove(key)
+
+        return len(keys)
+
+    def clear(self) -> None:
+        self.invalidate()
+        self.hits = self.misses = self.disk_hits = self.evictions = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+        }
+
+
+cache: ResultCache | None = None
+"the cache `sa_run` uses by default, None when caching wasn't enabled"
+
+
+def configure(options: bool | dict[str, Any]) -> ResultCache | None:
+    """Enable the default cache, `options` are `ResultCache` arguments. False disables it."""
+    global cache
+
+    if options is False:
+        cache = None
+    else:
+        cache = ResultCache(**(options if isinstance(options, dict) else {}))
+
+    return cache
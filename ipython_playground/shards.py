@@ -0,0 +1,148 @@
+"""
+Run the same statement against several databases at once, e.g. every shard of a sharded cluster.
+
+    results = sa_fanout({"us": US_URL, "eu": EU_URL}, select(func.count(User.id)))
+    for row in results: print(row.shard, row[0])    # row[0] is the count, not the tag
+
+Each database is queried on its own thread with its own session, through the engine cache so repeated fan-outs
+reuse warm pools. A failing shard doesn't fail the fan-out, its error is reported with the results.
+"""
+
+import time
+from collections.abc import Iterator, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any
+
+from .database import DEFAULT_MAX_ROWS, run_statement
+from .engines import PoolConfig, get_engine
+from .logger import log
+
+SHARD_WORKERS = 8
+"databases queried at the same time, the rest wait for a free thread"
+
+
+class ShardRow:
+    """A result row tagged with the shard it came from.
+
+    Attribute access, indexing and iteration go to the row, so `row.count` and `row[0]` are columns even though a
+    tuple has a `count` method and would put the tag first. Only `shard` and `row` are the tag and the wrapped row,
+    use `row.row.shard` for a column named `shard`.
+    """
+
+    __slots__ = ("row", "shard")
+
+    def __init__(self, shard: str, row: Any):
+        self.shard = shard
+        self.row = row
+
+    def __getattr__(self, attr: str) -> Any:
+        # only called for names which aren't slots
+        return getattr(self.row, attr)
+
+    def __getitem__(self, key: Any) -> Any:
+        return self.row[key]
+
+    def __iter__(self) -> Iterator:
+        return iter(self.row)
+
+    def __len__(self) -> int:
+        return len(self.row)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ShardRow):
+            return NotImplemented
+        return (self.shard, self.row) == (other.shard, other.row)
+
+    def __hash__(self) -> int:
+        return hash((self.shard, self.row))
+
+    def __repr__(self) -> str:
+        return f"ShardRow(shard={self.shard!r}, row={self.row!r})"
+
+
+@dataclass
+class ShardResults:
+    rows: list[ShardRow] = field(default_factory=list)
+    "rows of every shard which succeeded, grouped by shard in the order shards were given"
+    errors: dict[str, BaseException] = field(default_factory=dict)
+    durations: dict[str, float] = field(default_factory=dict)
+    "seconds each shard took, failed ones included"
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def __iter__(self) -> Iterator[ShardRow]:
+        return iter(self.rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def to_records(self) -> list[dict[str, Any]]:
+        """Rows as dicts with a `shard` key, ready for `pandas.DataFrame`."""
+        return [{"shard": r.shard, **r.row._mapping} for r in self.rows]
+
+
+def _shard_urls(shards: Sequence[str] | Mapping[str, str]) -> dict[str, str]:
+    "name -> url, URLs without a name are named after themselves with the password hidden"
+    if isinstance(shards, Mapping):
+        return dict(shards)
+
+    from sqlalchemy.engine import make_url  # type: ignore
+
+    return {make_url(url).render_as_string(hide_password=True): url for url in shards}
+
+
+def run_on_shards(
+    shards: Sequence[str] | Mapping[str, str],
+    stmt,
+    *,
+    max_rows: int | None = DEFAULT_MAX_ROWS,
+    workers: int = SHARD_WORKERS,
+    pool: PoolConfig = None,
+) -> ShardResults:
+    """Run `stmt` on every database in `shards` concurrently and merge the rows, tagged with their shard.
+
+    Args:
+        shards: database URLs, or a mapping of shard name to URL
+        max_rows: per shard, see `run_statement`
+        workers: maximum number of shards queried at once
+        pool: pool options for the engine of each shard
+    """
+    from sqlalchemy.orm import Session  # type: ignore
+
+    urls = _shard_urls(shards)
+
+    def query(name: str) -> list:
+        started = time.perf_counter()
+        try:
+            with Session(get_engine(urls[name], pool)) as session:
+                return run_statement(session, stmt, max_rows=max_rows)
+        finally:
+            results.durations[name] = time.perf_counter() - started
+
+    results = ShardResults()
+    rows_by_shard: dict[str, list] = {}
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(workers, len(urls))),
+        thread_name_prefix="ipython-playground-shard",
+    ) as executor:
+        futures = {executor.submit(query, name): name for name in urls}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                rows_by_shard[name] = future.result()
+            except Exception as e:  # noqa: BLE001 - reported with the results, the other shards still count
+                results.errors[name] = e
+
+    # merge in the order shards were given rather than completion order, so repeated runs line up
+    for name in urls:
+        results.rows.extend(ShardRow(name, row) for row in rows_by_shard.get(name, ()))
+
+    if results.errors:
+        failures = ", ".join(f"{name}: {e}" for name, e in results.errors.items())
+        log.warning(f"{len(results.errors)} of {len(urls)} shards failed: {failures}")
+
+    return results
@@ -0,0 +1,178 @@
+"""
+Bounded deep size estimates for the Variables section of `output()`.
+
+A full walk of a large object graph can take longer than the session is worth, so sizing stops at a recursion depth
+and a time budget, and large containers are sampled and extrapolated instead of walked. Estimates which hit any of
+those limits are flagged as approximate.
+"""
+
+import itertools
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from types import BuiltinFunctionType, FunctionType, ModuleType
+from typing import Any
+
+MAX_DEPTH = 8
+SAMPLE_SIZE = 256
+"containers longer than this are sampled"
+
+OBJECT_BUDGET = 0.02
+"seconds spent sizing a single variable"
+
+TOTAL_BUDGET = 2.0
+"seconds spent sizing a whole namespace, anything left after that only gets a shallow size"
+
+# shared by everything that references them, counting them against a single variable would be misleading
+_SHARED_TYPES = (type, ModuleType, FunctionType, BuiltinFunctionType)
+_FLAT_TYPES = (str, bytes, bytearray, int, float, complex, bool, type(None), range)
+_SEQUENCE_TYPES = (list, tuple, deque)
+_SET_TYPES = (set, frozenset)
+
+
+@dataclass
+class SizeEstimate:
+    bytes: int
+    approximate: bool
+
+    def __str__(self) -> str:
+        return ("~" if self.approximate else "") + format_size(self.bytes)
+
+
+def format_size(size: int) -> str:
+    value = float(size)
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+
+def _buffer_size(obj: Any) -> int | None:
+    "size of objects backed by a buffer (NumPy, pandas, Arrow, memoryview) without touching their elements"
+
+    if isinstance(obj, memoryview):
+        return sys.getsizeof(obj) + obj.nbytes
+
+    module = type(obj).__module__.split(".")[0]
+
+    if module == "pandas" and hasattr(obj, "memory_usage"):
+        # deep=True walks every python object in object columns, which is exactly what we are avoiding
+        usage = obj.memory_usage(index=True, deep=False)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+
+    nbytes = getattr(type(obj), "nbytes", None)
+    if module in ("numpy", "pyarrow") and nbytes is not None:
+        # ndarray's getsizeof already includes the data it owns, views only count the header
+        return max(sys.getsizeof(obj), int(obj.nbytes))
+
+    return None
+
+
+class _Sizer:
+    def __init__(self, deadline: float, max_depth: int, sample_size: int):
+        self.deadline = deadline
+        self.max_depth = max_depth
+        self.sample_size = sample_size
+        self.seen: set[int] = set()
+        self.approximate = False
+
+    def size(self, obj: Any, depth: int) -> int:
+        if id(obj) in self.seen or isinstance(obj, _SHARED_TYPES):
+            return 0
+        self.seen.add(id(obj))
+
+        if isinstance(obj, _FLAT_TYPES):
+            return sys.getsizeof(obj)
+
+        buffer_size = _buffer_size(obj)
+        if buffer_size is not None:
+            return buffer_size
+
+        size = sys.getsizeof(obj)
+
+        if depth >= self.max_depth or time.perf_counter() > self.deadline:
+            self.approximate = True
+            return size
+
+        if isinstance(obj, dict):
+            return size + self._container(obj.items(), len(obj), depth, pairs=True)
+        if isinstance(obj, _SEQUENCE_TYPES + _SET_TYPES):
+            return size + self._container(obj, len(obj), depth)
+
+        if hasattr(obj, "__dict__"):
+            size += self.size(vars(obj), depth + 1)
+
+        for slot in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, slot):
+                size += self.size(getattr(obj, slot), depth + 1)
+
+        return size
+
+    def _container(self, items, length: int, depth: int, pairs: bool = False) -> int:
+        if length > self.sample_size:
+            self.approximate = True
+            # deque indexing is O(n), so only lists & tuples are sampled evenly
+            if isinstance(items, list | tuple):
+                step = length / self.sample_size
+                items = [items[int(i * step)] for i in range(self.sample_size)]
+            else:
+                items = list(itertools.islice(items, self.sample_size))
+
+        total = 0
+        sized = 0
+        for item in items:
+            if time.perf_counter() > self.deadline:
+                self.approximate = True
+                break
+
+            if pairs:
+                key, value = item
+                total += self.size(key, depth + 1) + self.size(value, depth + 1)
+            else:
+                total += self.size(item, depth + 1)
+            sized += 1
+
+        if sized and sized < length:
+            # extrapolate from the items we looked at
+            return int(total * length / sized)
+        return total
+
+
+def deep_sizeof(
+    obj: Any,
+    *,
+    budget: float = OBJECT_BUDGET,
+    max_depth: int = MAX_DEPTH,
+    sample_size: int = SAMPLE_SIZE,
+) -> SizeEstimate:
+    """Estimate how much memory `obj` is holding on to, including everything it references.
+
+    Args:
+        budget: seconds to spend before settling for the size found so far
+        max_depth: how deep to follow references
+        sample_size: containers larger than this are sampled and extrapolated
+    """
+
+    sizer = _Sizer(time.perf_counter() + budget, max_depth, sample_size)
+    size = sizer.size(obj, 0)
+    return SizeEstimate(size, sizer.approximate)
+
+
+def size_all(
+    objects: dict[str, Any], budget: float = TOTAL_BUDGET
+) -> dict[str, SizeEstimate]:
+    """Deep size every value in `objects`, falling back to shallow sizes once `budget` seconds are used up."""
+
+    deadline = time.perf_counter() + budget
+    sizes = {}
+
+    for name, obj in objects.items():
+        remaining = deadline - time.perf_counter()
+        if remaining > 0:
+            sizes[name] = deep_sizeof(obj, budget=min(OBJECT_BUDGET, remaining))
+        else:
+            sizes[name] = SizeEstimate(sys.getsizeof(obj), approximate=True)
+
+    return sizes
@@ -0,0 +1,163 @@
+"""
+Approximate row counts and on-disk sizes of model tables, read from the database's catalog statistics.
+
+`COUNT(*)` scans the table, the planner's statistics are a single cheap catalog query for every table at once, so
+this can run at startup. The numbers are as fresh as the last `ANALYZE` (or autovacuum), tables which were never
+analyzed have no row count.
+
+- PostgreSQL: `pg_class.reltuples` and `pg_total_relation_size`, indexes and TOAST included
+- MySQL/MariaDB: `information_schema.tables`, data and index length
+- SQLite: `sqlite_stat1`, written by `ANALYZE`. SQLite has no cheap per-table size, so there is none.
+"""
+
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from rich.console import Console
+from rich.table import Table
+
+from .logger import log
+from .sizing import format_size
+
+SizeStats = dict[str, tuple[int | None, int | None]]
+"table name -> (rows, bytes)"
+
+LARGE_TABLE_ROWS = 100_000
+"tables with at least this many rows are highlighted, queries against them want an index or a limit"
+
+
+@dataclass
+class TableSize:
+    name: str
+    rows: int | None
+    "estimated from statistics, None when the table was never analyzed"
+    bytes: int | None
+    "table, index and TOAST storage where the database reports it"
+
+    @property
+    def large(self) -> bool:
+        return self.rows is not None and self.rows >= LARGE_TABLE_ROWS
+
+    def __str__(self) -> str:
+        rows = "not analyzed" if self.rows is None else f"~{self.rows:,} rows"
+        if self.bytes is None:
+            return rows
+        return f"{rows}, {format_size(self.bytes)}"
+
+
+def _names_param(sql: str):
+    from sqlalchemy import bindparam, text  # type: ignore
+
+    return text(sql).bindparams(bindparam("names", expanding=True))
+
+
+def _postgresql_sizes(connection, names: list[str]) -> SizeStats:
+    stmt = _names_param(
+        """
+        select c.relname, c.reltuples, pg_total_relation_size(c.oid)
+        from pg_class c join pg_namespace n on n.oid = c.relnamespace
+        where c.relkind in ('r', 'p') and n.nspname = any(current_schemas(false)) and c.relname in :names
+        """
+    )
+    # reltuples is -1 for tables which were never vacuumed or analyzed
+    return {
+        name: (int(rows) if rows >= 0 else None, size)
+        for name, rows, size in connection.execute(stmt, {"names": names})
+    }
+
+
+def _mysql_sizes(connection, names: list[str]) -> SizeStats:
+    stmt = _names_param(
+        """
+        select table_name, table_rows, data_length + index_length
+        from information_schema.tables
+        where table_schema = database() and table_name in :names
+        """
+    )
+    return {
+        name: (rows, size)
+        for name, rows, size in connection.execute(stmt, {"names": names})
+    }
+
+
+def _sqlite_sizes(connection, names: list[str]) -> SizeStats:
+    from sqlalchemy.exc import OperationalError  # type: ignore
+
+    # the first number of every stat row is the table's row count, tables without indexes have a row too
+    stmt = _names_param(
+        "select tbl, max(cast(stat as integer)) from sqlite_stat1 where tbl in :names group by tbl"
+    )
+    try:
+        return {
+            name: (rows, None)
+            for name, rows in connection.execute(stmt, {"names": names})
+        }
+    except OperationalError:
+        # sqlite_stat1 only exists once ANALYZE has run
+        return {}
+
+
+TABLE_SIZE_QUERIES: dict[str, Callable[[Any, list[str]], SizeStats]] = {
+    "postgresql": _postgresql_sizes,
+    "mysql": _mysql_sizes,
+    "mariadb": _mysql_sizes,
+    "sqlite": _sqlite_sizes,
+}
+"dialect name -> function reading the sizes of the named tables from catalog statistics in one query"
+
+
+def _table_name(table) -> str:
+    if isinstance(table, str):
+        return table
+    # models and Table objects
+    return getattr(table, "__table__", table).name
+
+
+def table_sizes(engine, tables: Iterable) -> list[TableSize]:
+    """Estimated sizes of `tables` (models, Table objects or names), largest first.
+
+    Returns an empty list for dialects without catalog statistics.
+    """
+
+    names = sorted({_table_name(table) for table in tables})
+    query = TABLE_SIZE_QUERIES.get(engine.dialect.name)
+    if query is None:
+        log.debug(f"No table statistics for {engine.dialect.name}")
+        return []
+
+    if not names:
+        return []
+
+    with engine.connect() as connection:
+        stats = query(connection, names)
+
+    sizes = [TableSize(name, *stats.get(name, (None, None))) for name in names]
+    # unanalyzed tables last, they could be anything
+    sizes.sort(key=lambda size: -1 if size.rows is None else size.rows, reverse=True)
+    return sizes
+
+
+def model_tables(objects: Iterable) -> list:
+    """The tables of the mapped model classes in `objects`, e.g. the values of the playground namespace."""
+    return [
+        obj.__table__
+        for obj in objects
+        if isinstance(obj, type) and getattr(obj, "__table__", None) is not None
+    ]
+
+
+def show_table_sizes(engine, tables: Iterable) -> None:
+    """Print estimated row counts and sizes of `tables`, large ones highlighted."""
+
+    table = Table("table", "rows", "size")
+    for size in table_sizes(engine, tables):
+        style = "red" if size.large else ("dim" if size.rows is None else None)
+        table.add_row(
+            size.name,
+            "not analyzed" if size.rows is None else f"~{size.rows:,}",
+            "" if size.bytes is None else format_size(size.bytes),
+            style=style,
+        )
+
+    Console().print(table)
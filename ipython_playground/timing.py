@@ -0,0 +1,88 @@
+"""
+Wall-clock and CPU timings for playground startup, surfaced by `output(profile=True)`.
+
+Nested imports are counted similar to `python -X importtime`: every module imported while a timing is running,
+directly or by one of its dependencies, is attributed to that timing.
+"""
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+
+@dataclass
+class Timing:
+    name: str
+    kind: str
+    "`stage` for a step of `extras.all`, `import` for a module import"
+    wall: float
+    "seconds"
+    cpu: float
+    "seconds of CPU time spent on the thread which ran this"
+    imports: int
+    "modules imported while this was running, nested imports included"
+
+
+timings: list[Timing] = []
+"everything timed this session, in completion order"
+
+_local = threading.local()
+
+
+class _ImportRecorder:
+    """
+    Meta path finder which never finds anything, it only records which modules were looked up.
+
+    Finders are only consulted for modules which are not in sys.modules yet, so each lookup is a fresh import attempt.
+    """
+
+    def find_spec(self, fullname, path=None, target=None):
+        attempted = _attempted_imports()
+        if _local.depth:
+            attempted.append(fullname)
+
+
+_recorder = _ImportRecorder()
+
+
+def _attempted_imports() -> list[str]:
+    if not hasattr(_local, "attempted"):
+        _local.attempted = []
+        _local.depth = 0
+    return _local.attempted
+
+
+@contextmanager
+def timed(name: str, kind: str = "stage"):
+    """Record wall, CPU time and nested imports for the wrapped block, even if it raises."""
+
+    if _recorder not in sys.meta_path:
+        sys.meta_path.insert(0, _recorder)
+
+    attempted = _attempted_imports()
+    first_attempt = len(attempted)
+    _local.depth += 1
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        # failed lookups (optional dependencies, etc) don't count as imports
+        imports = sum(1 for name in attempted[first_attempt:] if name in sys.modules)
+
+        # attempts are only needed while a timing is running, drop them once the outermost one finishes
+        _local.depth -= 1
+        if _local.depth == 0:
+            attempted.clear()
+
+        timings.append(Timing(name, kind, wall, cpu, imports))
+
+
+def slowest(limit: int = 15) -> list[Timing]:
+    """Timings ordered by wall-clock time, slowest first."""
+    return sorted(timings, key=lambda t: t.wall, reverse=True)[:limit]
@@ -0,0 +1,85 @@
+"""
+Compare `sa_bulk_load` against adding ORM objects one at a time, loading a CSV into a SQLite table.
+
+    uv run python playground/benchmark_bulk_load.py [rows]
+
+Every method starts from an empty table and commits once, so the difference is only how rows reach the database.
+"""
+
+import csv
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import sqlalchemy as sa
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from ipython_playground.bulk_load import bulk_load, iter_rows
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Event(Base):
+    __tablename__ = "events"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int]
+    amount: Mapped[float]
+    kind: Mapped[str]
+
+
+def write_csv(path: Path, rows: int):
+    with path.open("w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["user_id", "amount", "kind"])
+        for i in range(rows):
+            writer.writerow([i % 1000, i * 0.5, f"kind-{i % 7}"])
+
+
+def session_add(engine, path: Path):
+    with Session(engine) as session:
+        for row in iter_rows(path, Event.__table__):
+            session.add(Event(**row))
+            # what a loop in a notebook tends to do, flush so ids are available
+            session.flush()
+        session.commit()
+
+
+def session_add_all(engine, path: Path):
+    with Session(engine) as session:
+        session.add_all(Event(**row) for row in iter_rows(path, Event.__table__))
+        session.commit()
+
+
+def main(rows: int = 100_000):
+    methods = {
+        "session.add + flush": session_add,
+        "session.add_all": session_add_all,
+        "bulk_load": lambda engine, path: bulk_load(engine, Event, path),
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = Path(directory) / "events.csv"
+        write_csv(source, rows)
+
+        for name, load in methods.items():
+            engine = sa.create_engine(f"sqlite:///{Path(directory) / 'benchmark.db'}")
+            Base.metadata.drop_all(engine)
+            Base.metadata.create_all(engine)
+
+            started = time.perf_counter()
+            load(engine, source)
+            elapsed = time.perf_counter() - started
+
+            with engine.connect() as connection:
+                assert connection.scalar(sa.select(sa.func.count()).select_from(Event)) == rows
+            engine.dispose()
+
+            print(f"{name:<20} {elapsed:>8.2f}s {rows / elapsed:>12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,90 @@
+"""
+Compare `sa_run(stmt, as_=...)` against fetching every row with `.all()` on a million row SQLite table.
+
+    uv run python playground/benchmark_columnar.py [rows]
+
+Each method runs in a fresh process and reports the growth of its peak RSS, since Arrow allocates outside of
+Python's allocator and tracemalloc can't see it.
+"""
+
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from ipython_playground.database import run_statement
+from ipython_playground.sizing import format_size
+
+
+def create_table(path: Path, rows: int) -> sa.Engine:
+    engine = sa.create_engine(f"sqlite:///{path}")
+    metadata = sa.MetaData()
+    events = sa.Table(
+        "events",
+        metadata,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer),
+        sa.Column("amount", sa.Float),
+        sa.Column("kind", sa.String),
+    )
+    metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        for start in range(0, rows, 100_000):
+            connection.execute(
+                events.insert(),
+                [
+                    {"user_id": i % 1000, "amount": i * 0.5, "kind": f"kind-{i % 7}"}
+                    for i in range(start, min(start + 100_000, rows))
+                ],
+            )
+
+    return engine
+
+
+def peak_rss() -> int:
+    # kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure(path: Path, method: str):
+    engine = sa.create_engine(f"sqlite:///{path}")
+    stmt = sa.text("select id, user_id, amount, kind from events")
+
+    with Session(engine) as session:
+        baseline = peak_rss()
+        started = time.perf_counter()
+
+        if method == "all()":
+            result = session.execute(stmt).all()
+        else:
+            result = run_statement(session, stmt, max_rows=None, as_=method)  # type: ignore[arg-type]
+
+        elapsed = time.perf_counter() - started
+        growth = peak_rss() - baseline
+
+    print(f"{method:<10} {elapsed:>8.2f}s {format_size(growth):>12} peak RSS growth")
+    del result
+
+
+def main(rows: int = 1_000_000):
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "benchmark.db"
+        create_table(path, rows).dispose()
+
+        for method in ("all()", "arrow", "numpy", "pandas"):
+            subprocess.run(
+                [sys.executable, __file__, "--measure", str(path), method], check=True
+            )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--measure"]:
+        measure(Path(sys.argv[2]), sys.argv[3])
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
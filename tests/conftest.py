@@ -0,0 +1,22 @@
+import pytest
+
+
+@pytest.fixture
+def session(tmp_path):
+    """ORM session on a SQLite database with a `numbers` table holding the values 0 to 249."""
+
+    sa = pytest.importorskip("sqlalchemy")
+    orm = pytest.importorskip("sqlalchemy.orm")
+
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'playground.db'}")
+    metadata = sa.MetaData()
+    numbers = sa.Table("numbers", metadata, sa.Column("value", sa.Integer))
+    metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        connection.execute(numbers.insert(), [{"value": i} for i in range(250)])
+
+    with orm.Session(engine) as session:
+        yield session
+
+    engine.dispose()
@@ -0,0 +1,146 @@
+import datetime
+import json
+
+import pytest
+
+from ipython_playground.bulk_load import bulk_load, iter_rows
+
+sa = pytest.importorskip("sqlalchemy")
+orm = pytest.importorskip("sqlalchemy.orm")
+
+
+class Base(orm.DeclarativeBase):
+    pass
+
+
+class Event(Base):
+    __tablename__ = "events"
+
+    id: orm.Mapped[int] = orm.mapped_column(primary_key=True)
+    name: orm.Mapped[str]
+    score: orm.Mapped[float | None]
+    happened_at: orm.Mapped[datetime.datetime | None]
+
+
+events = Event.__table__
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'playground.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def all_events(engine):
+    with engine.connect() as connection:
+        return connection.execute(sa.select(events).order_by(events.c.id)).all()
+
+
+def test_iterable_is_loaded_in_batches(engine):
+    statements = []
+    sa.event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+
+    rows = ({"id": i, "name": f"event {i}"} for i in range(25))
+    result = bulk_load(engine, Event, rows, batch_size=10)
+
+    assert result.rows == 25
+    assert result.table == "events"
+    assert "rows/s" in str(result)
+    assert len(all_events(engine)) == 25
+    # three batches, each a multi-row insert rather than a statement per row
+    assert sum(sql.startswith("INSERT") for sql in statements) == 3
+
+
+def test_model_instances_and_tables(engine):
+    bulk_load(engine, events, [Event(id=1, name="first")])
+
+    assert all_events(engine)[0].name == "first"
+
+
+def test_csv_values_are_parsed_by_column_type(engine, tmp_path):
+    path = tmp_path / "events.csv"
+    path.write_text(
+        "id,name,score,happened_at\n1,launch,1.5,2024-01-02T03:04:05\n2,,,\n"
+    )
+
+    bulk_load(engine, Event, path)
+
+    first, second = all_events(engine)
+    assert first.score == 1.5
+    assert first.happened_at == datetime.datetime(2024, 1, 2, 3, 4, 5)
+    # empty cells are NULL in typed columns but stay empty strings in text ones
+    assert second.name == ""
+    assert second.score is None
+    assert second.happened_at is None
+
+
+def test_jsonl_and_unknown_keys(engine, tmp_path, caplog):
+    path = tmp_path / "events.jsonl"
+    path.write_text(
+        "\n".join(
+            json.dumps({"id": i, "name": "event", "source": "import"}) for i in range(3)
+        )
+        + "\n"
+    )
+
+    assert bulk_load(engine, Event, str(path)).rows == 3
+    assert caplog.text.count("Ignoring keys") == 1
+    assert "['source']" in caplog.text
+
+
+def test_jsonl_strings_are_parsed_by_column_type(engine, tmp_path):
+    path = tmp_path / "events.jsonl"
+    path.write_text(
+        json.dumps(
+            {
+                "id": 1,
+                "name": "launch",
+                "score": 2,
+                "happened_at": "2024-01-01T00:00:00",
+            }
+        )
+        + "\n"
+    )
+
+    bulk_load(engine, Event, path)
+
+    (event,) = all_events(engine)
+    assert event.happened_at == datetime.datetime(2024, 1, 1)
+    assert event.score == 2
+
+
+def test_unset_primary_keys_are_left_to_the_database(engine):
+    class Unsaved:
+        "stands in for an unsaved SQLModel instance"
+
+        def model_dump(self):
+            return {"id": None, "name": "new", "score": None}
+
+    # an explicit NULL id breaks serial and identity columns, NULLs elsewhere stay
+    assert list(iter_rows([Unsaved()], events)) == [{"name": "new", "score": None}]
+
+    bulk_load(engine, Event, [Unsaved(), Unsaved()])
+    assert [event.id for event in all_events(engine)] == [1, 2]
+
+
+def test_failed_batch_rolls_back_the_load(engine):
+    rows = [{"id": 1, "name": "first"}, {"id": 1, "name": "duplicate"}]
+
+    with pytest.raises(sa.exc.IntegrityError):
+        bulk_load(engine, Event, rows, batch_size=1)
+
+    assert all_events(engine) == []
+
+
+def test_unsupported_sources_and_methods(engine, tmp_path):
+    with pytest.raises(ValueError, match="Unsupported file type"):
+        bulk_load(engine, Event, tmp_path / "events.xlsx")
+
+    with pytest.raises(ValueError, match="COPY needs PostgreSQL"):
+        bulk_load(engine, Event, [], method="copy")
@@ -0,0 +1,43 @@
+import pytest
+
+from ipython_playground.cells import CellMonitor, CellStats, register_cell_stats
+from ipython_playground.queries import QueryRecorder
+
+sa = pytest.importorskip("sqlalchemy")
+
+
+def test_cell_stats_counts_statements(capsys):
+    engine = sa.create_engine("sqlite://")
+    recorder = QueryRecorder()
+    recorder.attach(engine)
+    monitor = CellMonitor(recorder)
+
+    monitor.pre_run_cell()
+    with engine.connect() as connection:
+        for i in range(3):
+            connection.execute(sa.text(f"select {i}"))
+    stats = monitor.post_run_cell()
+
+    assert stats is not None
+    assert stats.statements == 3
+    assert stats.db_time > 0
+    assert stats.wall >= stats.db_time
+    assert "3 sql" in capsys.readouterr().out
+
+    engine.dispose()
+
+
+def test_post_run_cell_without_pre_run_cell():
+    assert CellMonitor(QueryRecorder()).post_run_cell() is None
+
+
+def test_cell_stats_summary():
+    stats = CellStats(
+        wall=1.5, cpu=0.25, statements=0, db_time=0.0, peak_memory=2 * 1024**2
+    )
+
+    assert str(stats) == "1.50s wall, 0.25s cpu, 0 sql, +2.0 MB peak"
+
+
+def test_register_outside_ipython():
+    assert register_cell_stats() is None
@@ -0,0 +1,253 @@
+import contextvars
+import json
+import sys
+import types
+
+import pytest
+
+from ipython_playground import columnar, guard, queries, result_cache
+from ipython_playground.database import (
+    connect_in_background,
+    run_columnar,
+    run_statement,
+    setup_database_session,
+    stream_statement,
+)
+from ipython_playground.engines import dispose_engine
+
+sa = pytest.importorskip("sqlalchemy")
+orm = pytest.importorskip("sqlalchemy.orm")
+
+
+def test_run_statement_caps_rows(session, caplog):
+    rows = run_statement(session, sa.text("select value from numbers"), max_rows=100)
+
+    assert len(rows) == 100
+    assert rows[0].value == 0
+    assert "truncated to 100 rows" in caplog.text
+
+
+def test_run_statement_without_cap(session, caplog):
+    rows = run_statement(session, sa.text("select value from numbers"), max_rows=None)
+
+    assert len(rows) == 250
+    assert "truncated" not in caplog.text
+
+
+def test_run_statement_under_cap_does_not_warn(session, caplog):
+    rows = run_statement(session, sa.text("select value from numbers limit 5"))
+
+    assert [row.value for row in rows] == [0, 1, 2, 3, 4]
+    assert "truncated" not in caplog.text
+
+
+def test_stream_statement_yields_in_chunks(session):
+    stream = stream_statement(
+        session, sa.text("select value from numbers"), chunk_size=50
+    )
+
+    assert sum(row.value for row in stream) == sum(range(250))
+
+
+def test_run_statement_as_arrow(session, caplog):
+    pytest.importorskip("pyarrow")
+
+    table = run_statement(
+        session, sa.text("select value from numbers"), max_rows=100, as_="arrow"
+    )
+
+    assert table.num_rows == 100
+    assert table.column("value").to_pylist() == list(range(100))
+    assert "truncated to 100 rows" in caplog.text
+
+
+def test_run_statement_as_numpy(session):
+    pytest.importorskip("numpy")
+
+    columns = run_statement(
+        session, sa.text("select value from numbers"), max_rows=None, as_="numpy"
+    )
+
+    assert list(columns) == ["value"]
+    assert columns["value"].sum() == sum(range(250))
+
+
+def test_run_statement_as_pandas(session, caplog):
+    pytest.importorskip("pandas")
+
+    frame = run_statement(
+        session, sa.text("select value from numbers"), max_rows=250, as_="pandas"
+    )
+
+    assert len(frame) == 250
+    assert frame["value"].iloc[-1] == 249
+    assert "truncated" not in caplog.text
+
+
+def test_run_statement_as_empty_result(session):
+    pytest.importorskip("pyarrow")
+
+    table = run_statement(
+        session, sa.text("select value from numbers where value < 0"), as_="arrow"
+    )
+
+    assert table.num_rows == 0
+    assert table.column_names == ["value"]
+
+
+@pytest.mark.parametrize("as_", ["arrow", "pandas"])
+def test_run_columnar_promotes_types_across_chunks(session, as_):
+    pytest.importorskip("pyarrow")
+
+    # SQLite's dynamic typing: the first chunk is all integers, the second all floats
+    stmt = sa.text(
+        "select case when value < 3 then value else value + 0.5 end as value"
+        " from numbers where value < 6"
+    )
+    result = run_columnar(session, stmt, as_, max_rows=None, chunk_size=3)
+
+    values = (
+        result.column("value").to_pylist() if as_ == "arrow" else list(result["value"])
+    )
+    assert values == [0, 1, 2, 3.5, 4.5, 5.5]
+
+
+@pytest.mark.parametrize("as_", ["arrow", "numpy", "pandas"])
+def test_run_columnar_keeps_columns_sharing_a_name(session, as_):
+    pytest.importorskip("pyarrow" if as_ == "arrow" else as_)
+
+    # a text() join selecting two `id` columns
+    stmt = sa.text("select value as id, value * 10 as id from numbers where value < 4")
+    result = run_columnar(session, stmt, as_, max_rows=None, chunk_size=3)
+
+    if as_ == "arrow":
+        assert result.column_names == ["id", "id_1"]
+        result = result.to_pandas()
+
+    assert list(result["id"]) == [0, 1, 2, 3]
+    assert list(result["id_1"]) == [0, 10, 20, 30]
+
+
+def test_run_columnar_falls_back_to_rows(session, caplog, monkeypatch):
+    monkeypatch.setattr(columnar, "_optional_import", lambda name: None)
+
+    rows = run_columnar(session, sa.text("select value from numbers"), "numpy")
+
+    assert len(rows) == 250
+    assert "numpy is not installed" in caplog.text
+
+
+def test_run_columnar_rejects_unknown_format(session):
+    with pytest.raises(ValueError, match="Unknown format"):
+        run_columnar(session, sa.text("select value from numbers"), "polars")  # type: ignore[arg-type]
+
+
+def test_connect_in_background_warms_the_pool(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'warm.db'}")
+
+    connect_in_background(engine).result(timeout=10)
+
+    assert engine.pool.checkedin() == 1
+    engine.dispose()
+
+
+def test_connect_in_background_reports_failures(tmp_path, caplog):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'missing' / 'cold.db'}")
+
+    connect_in_background(engine).result(timeout=10)
+
+    assert "Could not connect to sqlite:///" in caplog.text
+
+
+@pytest.fixture
+def playground(tmp_path, monkeypatch):
+    """`setup_database_session` helpers for a SQLite database, with activemodel and sqlmodel stubbed out."""
+
+    class SessionManager:
+        @classmethod
+        def get_instance(cls, database_url=None):
+            return cls()
+
+    class SQLModel(orm.DeclarativeBase):
+        pass
+
+    stubs = {
+        "activemodel": {"SessionManager": SessionManager},
+        "activemodel.session_manager": {
+            "_serialize_pydantic_model": json.dumps,
+            "_session_context": contextvars.ContextVar("session", default=None),
+        },
+        "activemodel.utils": {"compile_sql": str},
+        "sqlmodel": {"Session": orm.Session, "SQLModel": SQLModel},
+    }
+    for name, attributes in stubs.items():
+        module = types.ModuleType(name)
+        vars(module).update(attributes)
+        monkeypatch.setitem(sys.modules, name, module)
+
+    # setup_database_session configures these module level singletons
+    monkeypatch.setattr(result_cache, "cache", None)
+    monkeypatch.setattr(guard, "options", None)
+
+    url = f"sqlite:///{tmp_path / 'playground.db'}"
+    engine = sa.create_engine(url)
+    with engine.begin() as connection:
+        connection.execute(sa.text("create table numbers (value integer)"))
+        connection.execute(
+            sa.text("insert into numbers values (:value)"),
+            [{"value": i} for i in range(250)],
+        )
+    engine.dispose()
+
+    helpers = setup_database_session(
+        url, query_cache=True, guarded={"max_cost": 1_000, "timeout": 5}
+    )
+    yield helpers
+
+    helpers["session"].close()
+    queries.recorder.detach(helpers["engine"])
+    dispose_engine()
+
+
+def test_sa_run_combines_guard_cache_and_columnar(playground):
+    pytest.importorskip("pyarrow")
+    sa_run = playground["sa_run"]
+    numbers = sa.table("numbers", sa.column("value"))
+
+    table = sa_run(sa.select(numbers.c.value), max_rows=100, as_="arrow")
+
+    assert table.num_rows == 100
+    # the guard limited the query, the database never sent more than max_rows + 1 rows
+    assert "LIMIT" in queries.recorder.records[-1].statement
+    assert queries.recorder.records[-1].rowcount == 101
+
+    statements = queries.recorder.statement_count
+    again = sa_run(sa.select(numbers.c.value), max_rows=100, as_="arrow")
+
+    assert again.equals(table)
+    assert queries.recorder.statement_count == statements
+    assert playground["sa_cache"].hits == 1
+
+
+def test_sa_run_refuses_costly_statements_unless_forced(playground, monkeypatch):
+    monkeypatch.setitem(
+        guard.COST_ESTIMATORS, "sqlite", lambda connection, sql, params: 5_000.0
+    )
+    sa_run = playground["sa_run"]
+    numbers = sa.table("numbers", sa.column("value"))
+
+    with pytest.raises(guard.QueryRefused):
+        sa_run(sa.select(numbers.c.value))
+
+    assert len(sa_run(sa.select(numbers.c.value), force=True, max_rows=10)) == 10
+
+
+def test_sa_run_never_caches_writes(playground):
+    sa_run = playground["sa_run"]
+    numbers = sa.table("numbers", sa.column("value"))
+    insert = numbers.insert().values(value=1_000).returning(numbers.c.value)
+
+    assert sa_run(insert) == sa_run(insert)
+
+    count = sa.select(sa.func.count()).where(numbers.c.value == 1_000)
+    assert sa_run(count, cache=False)[0][0] == 2
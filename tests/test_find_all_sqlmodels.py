@@ -1,3 +1,4 @@
+import importlib
 import sys
 import types
 from enum import Enum
@@ -68,3 +69,71 @@ class User(SQLModel):
         for mod in modules_to_clean:
             if mod in sys.modules:
                 del sys.modules[mod]
+
+
+def test_find_all_sqlmodels_large_synthetic_package(tmp_path):
+    mock_sqlmodel = types.ModuleType("sqlmodel")
+
+    class MockSQLModel:
+        pass
+
+    mock_sqlmodel.SQLModel = MockSQLModel
+    sys.modules["sqlmodel"] = mock_sqlmodel
+
+    pkg_dir = tmp_path / "big_app"
+    models_dir = pkg_dir / "models"
+    models_dir.mkdir(parents=True)
+    (pkg_dir / "__init__.py").write_text("")
+    (models_dir / "__init__.py").write_text("")
+
+    module_count = 30
+    models_per_module = 100
+    for i in range(module_count):
+        classes = "\n".join(
+            f"class Model{i}x{j}(SQLModel):\n    pass\n"
+            for j in range(models_per_module)
+        )
+        (models_dir / f"module_{i:02}.py").write_text(
+            "from enum import Enum, StrEnum\n"
+            "from sqlmodel import SQLModel\n"
+            # imported from outside the package, should not be picked up
+            "from big_app.outside import OutsideModel\n"
+            f"class Status{i}(str, Enum):\n    active = 'active'\n"
+            f"class Shared(SQLModel):\n    origin = {i}\n" + classes
+        )
+
+    # sorts after the modules defining `Shared`, so its re-export wins the name
+    (models_dir / "reexport.py").write_text(
+        "from big_app.models.module_00 import Shared\n"
+    )
+
+    (pkg_dir / "outside.py").write_text(
+        "from sqlmodel import SQLModel\nclass OutsideModel(SQLModel):\n    pass\n"
+    )
+
+    sys.path.insert(0, str(tmp_path))
+
+    try:
+        import big_app.models
+
+        for i in range(module_count):
+            importlib.import_module(f"big_app.models.module_{i:02}")
+        importlib.import_module("big_app.models.reexport")
+
+        models = find_all_sqlmodels(big_app.models)
+
+        # every model, one enum per module and the colliding `Shared` name once
+        assert len(models) == module_count * models_per_module + module_count + 1
+        assert "Model0x0" in models
+        assert f"Model{module_count - 1}x{models_per_module - 1}" in models
+        assert "Status7" in models
+        assert "OutsideModel" not in models
+        assert "StrEnum" not in models
+
+        # the module which sorts last wins a name collision, even with a re-export
+        assert models["Shared"].origin == 0
+    finally:
+        sys.path.pop(0)
+        for mod in list(sys.modules):
+            if mod == "big_app" or mod.startswith("big_app.") or mod == "sqlmodel":
+                del sys.modules[mod]
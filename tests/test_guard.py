@@ -0,0 +1,166 @@
+import enum
+
+import pytest
+
+from ipython_playground import guard
+from ipython_playground.database import run_statement
+from ipython_playground.guard import (
+    GuardOptions,
+    QueryRefused,
+    apply_guard,
+    estimate_cost,
+    guarded_run,
+)
+from ipython_playground.queries import QueryRecorder
+
+sa = pytest.importorskip("sqlalchemy")
+
+# the table of the `session` fixture
+numbers = sa.table("numbers", sa.column("value"))
+
+
+def run_guarded(session, stmt, options=None, *, max_rows=100, force=False):
+    return guarded_run(
+        session,
+        stmt,
+        lambda guarded: run_statement(session, guarded, max_rows=max_rows),
+        options or GuardOptions(),
+        max_rows=max_rows,
+        force=force,
+    )
+
+
+def test_unbounded_select_gets_a_limit(session, caplog):
+    recorder = QueryRecorder()
+    recorder.attach(session.get_bind())
+
+    rows = run_guarded(session, sa.select(numbers.c.value))
+
+    assert len(rows) == 100
+    assert "truncated to 100 rows" in caplog.text
+    assert "LIMIT" in recorder.records[-1].statement
+    assert recorder.records[-1].parameters[-2] == 101
+
+
+def test_existing_limit_and_text_statements_are_kept():
+    limited = sa.select(numbers).limit(5)
+    raw = sa.text("select * from numbers")
+
+    assert apply_guard(limited, "sqlite", GuardOptions(), 100) is limited
+    assert apply_guard(raw, "sqlite", GuardOptions(), 100) is raw
+
+    unbounded = apply_guard(sa.select(numbers), "sqlite", GuardOptions(), None)
+    assert "LIMIT" not in str(unbounded)
+
+
+def test_mysql_gets_an_execution_time_hint():
+    from sqlalchemy.dialects import mysql
+
+    stmt = apply_guard(sa.select(numbers), "mysql", GuardOptions(timeout=2), 10)
+
+    assert "/*+ MAX_EXECUTION_TIME(2000) */" in str(
+        stmt.compile(dialect=mysql.dialect())
+    )
+
+
+def test_sqlite_has_no_cost_model(session):
+    assert estimate_cost(session.connection(), sa.select(numbers)) is None
+
+
+def test_costly_plans_are_refused_unless_forced(session, monkeypatch):
+    monkeypatch.setitem(
+        guard.COST_ESTIMATORS, "sqlite", lambda connection, sql, params: 5_000.0
+    )
+    options = GuardOptions(max_cost=1_000)
+
+    with pytest.raises(QueryRefused, match="Estimated cost 5,000"):
+        run_guarded(session, sa.select(numbers), options)
+
+    assert len(run_guarded(session, sa.select(numbers), options, force=True)) == 100
+
+
+def test_cost_estimator_gets_driver_sql(session, monkeypatch):
+    seen = []
+
+    def estimator(connection, sql, params):
+        seen.append((sql, params))
+        # the parameters have to line up with the placeholders
+        connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params)
+        return 1.0
+
+    monkeypatch.setitem(guard.COST_ESTIMATORS, "sqlite", estimator)
+
+    run_guarded(session, sa.select(numbers).where(numbers.c.value.in_([1, 2])))
+
+    ((sql, params),) = seen
+    assert "IN (?, ?)" in sql
+    assert params == (1, 2, 101, 0)
+
+
+class Status(enum.Enum):
+    active = "active"
+
+
+def test_cost_estimator_gets_processed_parameters(session, monkeypatch):
+    seen = []
+    monkeypatch.setitem(
+        guard.COST_ESTIMATORS,
+        "sqlite",
+        lambda connection, sql, params: seen.append(params) or 1.0,
+    )
+    orders = sa.table(
+        "orders", sa.column("status", sa.Enum(Status)), sa.column("data", sa.JSON)
+    )
+
+    estimate_cost(
+        session.connection(),
+        sa.select(orders).where(
+            orders.c.status == Status.active, orders.c.data == {"open": True}
+        ),
+    )
+
+    # drivers can't adapt enum members or dicts, they get what an executed statement would send
+    assert seen == [("active", '{"open": true}')]
+
+
+def test_sqlite_statements_time_out(session):
+    slow = sa.text(
+        "with recursive counter(n) as (select 1 union all select n + 1 from counter)"
+        " select count(*) from counter"
+    )
+
+    with pytest.raises(sa.exc.OperationalError, match="interrupted"):
+        run_guarded(session, slow, GuardOptions(timeout=0.05))
+
+    # the handler is removed afterwards
+    assert run_guarded(session, sa.text("select 1"))[0][0] == 1
+
+
+def test_postgresql_timeout_is_not_reset_after_a_failure():
+    statements = []
+
+    class Connection:
+        def exec_driver_sql(self, sql):
+            statements.append(sql)
+
+    # the reset would fail in the aborted transaction and replace the statement's error
+    with (
+        pytest.raises(RuntimeError, match="canceling statement"),
+        guard._postgresql_timeout(Connection(), 1.5),
+    ):
+        raise RuntimeError("canceling statement due to statement timeout")
+
+    assert statements == ["SET LOCAL statement_timeout = 1500"]
+
+    with guard._postgresql_timeout(Connection(), 1.5):
+        pass
+
+    assert statements[-1] == "SET LOCAL statement_timeout = DEFAULT"
+
+
+def test_configure():
+    try:
+        assert guard.configure({"max_cost": 10}).max_cost == 10
+        assert guard.configure(False) is None
+    finally:
+        guard.options = None
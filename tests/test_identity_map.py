@@ -0,0 +1,140 @@
+import pytest
+
+from ipython_playground.identity_map import (
+    IdentityMapMonitor,
+    expunge,
+    identity_map_usage,
+    read_only_iteration,
+    register_identity_map_monitor,
+    reset_session,
+)
+
+sa = pytest.importorskip("sqlalchemy")
+orm = pytest.importorskip("sqlalchemy.orm")
+
+
+class Base(orm.DeclarativeBase):
+    pass
+
+
+class Author(Base):
+    __tablename__ = "authors"
+
+    id: orm.Mapped[int] = orm.mapped_column(primary_key=True)
+    name: orm.Mapped[str]
+
+
+class Book(Base):
+    __tablename__ = "books"
+
+    id: orm.Mapped[int] = orm.mapped_column(primary_key=True)
+    title: orm.Mapped[str]
+    author_id: orm.Mapped[int] = orm.mapped_column(sa.ForeignKey("authors.id"))
+    author: orm.Mapped[Author] = orm.relationship(lazy="joined")
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'playground.db'}")
+    Base.metadata.create_all(engine)
+
+    with orm.Session(engine) as session:
+        session.add_all(Author(id=i, name=f"author {i}") for i in range(5))
+        session.add_all(Book(id=i, title="x" * 100, author_id=i % 5) for i in range(50))
+        session.commit()
+        session.expunge_all()
+        yield session
+
+    engine.dispose()
+
+
+def test_usage_per_class(session):
+    # the identity map only holds objects weakly, like IPython's Out would
+    books = session.scalars(sa.select(Book)).all()
+
+    usage = {entry.model: entry for entry in identity_map_usage(session)}
+
+    assert usage[Book].count == 50
+    assert usage[Author].count == 5
+    assert usage[Book].memory.approximate
+    assert usage[Book].memory.bytes > usage[Author].memory.bytes
+    assert len(books) == 50
+
+
+def test_expunge_keeps_modified_objects(session):
+    books = session.scalars(sa.select(Book)).all()
+    books[0].title = "changed"
+
+    assert expunge(session, Book) == 49
+    assert books[0] in session
+    assert books[1] not in session
+    # authors weren't asked for
+    assert len(session.identity_map) == 6
+
+    session.flush()
+    assert session.scalar(sa.select(Book.title).where(Book.id == 0)) == "changed"
+
+
+def test_expunge_keeps_pending_deletes(session):
+    authors = session.scalars(sa.select(Author)).all()
+    session.delete(authors[0])
+
+    assert expunge(session, Author) == 4
+    session.commit()
+
+    assert session.get(Author, 0) is None
+
+
+def test_reset_session_keeps_it_usable(session, caplog):
+    authors = session.scalars(sa.select(Author)).all()
+    authors[0].name = "changed"
+
+    assert reset_session(session) == 5
+    assert "Discarding 1 unflushed changes" in caplog.text
+    assert len(session.identity_map) == 0
+    assert session.scalar(sa.select(Author.name).where(Author.id == 0)) == "author 0"
+
+
+def test_read_only_iteration_expunges_each_chunk(session):
+    kept = session.get(Author, 0)
+
+    with read_only_iteration(session, sa.select(Book), chunk_size=10) as rows:
+        seen = [book for (book,) in rows]
+
+    assert len(seen) == 50
+    assert all(orm.object_session(book) is None for book in seen)
+    # objects the session held before iterating stay
+    assert kept in session
+    assert len(session.identity_map) == 1
+
+
+def test_read_only_iteration_bounds_the_identity_map(session):
+    sizes = []
+
+    with read_only_iteration(session, sa.select(Book), chunk_size=10) as rows:
+        for _ in rows:
+            sizes.append(len(session.identity_map))
+
+    # a chunk of books plus the authors they joined
+    assert max(sizes) <= 15
+
+
+def test_monitor_warns_once_per_crossing(session, caplog):
+    monitor = IdentityMapMonitor(session, threshold=20)
+
+    books = session.scalars(sa.select(Book)).all()
+    assert monitor.post_run_cell()
+    assert "The session holds 55 objects (Book: 50" in caplog.text
+    assert not monitor.post_run_cell()
+
+    expunge(session)
+    assert not monitor.post_run_cell()
+
+    books = session.scalars(sa.select(Book)).all()
+    assert monitor.post_run_cell()
+    assert len(books) == 50
+
+
+def test_register_outside_ipython(session):
+    pytest.importorskip("IPython")
+    assert register_identity_map_monitor(session) is None
@@ -0,0 +1,176 @@
+import sys
+import types
+from concurrent.futures import Future
+
+from ipython_playground import extras, lazy
+from ipython_playground.extras import ModelInjector, load_modules_for_ipython
+from ipython_playground.lazy import (
+    LazyAttribute,
+    LazyModule,
+    PendingValue,
+    unwrap,
+    warm,
+)
+
+
+def test_lazy_module_imports_on_first_attribute_access():
+    sys.modules.pop("colorsys", None)
+
+    proxy = LazyModule("colorsys")
+    assert proxy.__name__ == "colorsys"
+    assert not proxy.is_loaded
+    assert "colorsys" not in sys.modules
+    assert "not loaded" in repr(proxy)
+
+    assert proxy.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert proxy.is_loaded
+    assert lazy.unwrap(proxy) is sys.modules["colorsys"]
+
+
+def test_lazy_attribute_behaves_like_target():
+    proxy = LazyAttribute("fractions", "Fraction")
+    assert lazy.is_unloaded(proxy)
+
+    value = proxy(1, 2)
+    assert isinstance(value, proxy)
+    assert not lazy.is_unloaded(proxy)
+
+    class Half(proxy):  # type: ignore[misc]
+        pass
+
+    from fractions import Fraction
+
+    assert issubclass(Half, Fraction)
+    assert lazy.unwrap(proxy) is Fraction
+
+
+def test_load_modules_lazy_respects_eager_flag():
+    sys.modules.pop("colorsys", None)
+
+    modules = load_modules_for_ipython(
+        [
+            {"module": "json", "eager": True},
+            {
+                "module": "colorsys",
+                "extra_imports": [{"from": "colorsys", "import": "hsv_to_rgb"}],
+            },
+            {"module": "a_module_that_does_not_exist"},
+        ],
+        lazy=True,
+    )
+
+    assert modules["json"] is sys.modules["json"]
+    assert isinstance(modules["colorsys"], LazyModule)
+    assert isinstance(modules["hsv_to_rgb"], LazyAttribute)
+    assert "a_module_that_does_not_exist" not in modules
+    assert "colorsys" not in sys.modules
+
+
+def test_background_imports_warm_on_worker_pool(tmp_path):
+    (tmp_path / "slow_playground_module.py").write_text(
+        "import threading, time\n"
+        "time.sleep(0.05)\n"
+        "IMPORTED_ON = threading.current_thread().name\n"
+    )
+    (tmp_path / "broken_playground_module.py").write_text(
+        "raise RuntimeError('boom')\n"
+    )
+    sys.path.insert(0, str(tmp_path))
+
+    try:
+        modules = load_modules_for_ipython(
+            [
+                {"module": "slow_playground_module", "eager": True},
+                {"module": "broken_playground_module"},
+            ],
+            background=True,
+        )
+
+        slow = modules["slow_playground_module"]
+        assert isinstance(slow, LazyModule)
+        assert slow.IMPORTED_ON.startswith("ipython-playground-import")
+
+        broken = modules["broken_playground_module"]
+        assert lazy.wait_until_loaded(broken) is None
+        assert isinstance(broken.load_error, RuntimeError)
+        assert isinstance(lazy.import_errors["broken_playground_module"], RuntimeError)
+    finally:
+        sys.path.remove(str(tmp_path))
+        lazy.import_errors.clear()
+        for name in ["slow_playground_module", "broken_playground_module"]:
+            sys.modules.pop(name, None)
+
+
+def cell(source: str):
+    "the `info` IPython passes to pre_run_cell"
+    return types.SimpleNamespace(raw_cell=source)
+
+
+def test_models_are_injected_after_the_background_import(monkeypatch):
+    monkeypatch.setattr(
+        extras, "find_all_sqlmodels", lambda module: {"User": module.User, "session": 1}
+    )
+    models = types.ModuleType("background_models")
+    models.User = type("User", (), {})
+
+    app_models = LazyModule("background_models")
+    importing = Future()
+    app_models.__dict__["_lazy_future"] = importing
+    namespace = {"session": "the session"}
+    injector = ModelInjector(app_models, namespace)
+
+    # still importing, a cell which only uses names the namespace has doesn't wait
+    assert not injector.pre_run_cell(cell("print(session)"))
+    assert "User" not in namespace
+
+    app_models.__dict__["_lazy_module"] = models
+    importing.set_result(models)
+
+    assert injector.pre_run_cell(cell("1 + 1"))
+    assert namespace["User"] is models.User
+    assert namespace["session"] == "the session"
+    assert not injector.pre_run_cell(cell("1 + 1"))
+
+
+def test_cell_naming_a_missing_model_waits_for_the_import(tmp_path, monkeypatch):
+    (tmp_path / "slow_models.py").write_text(
+        "import time\ntime.sleep(0.1)\nclass User:\n    pass\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(
+        extras, "find_all_sqlmodels", lambda module: {"User": module.User}
+    )
+
+    try:
+        namespace: dict = {}
+        injector = ModelInjector(warm(LazyModule("slow_models")), namespace)
+
+        assert injector.pre_run_cell(cell("User()"))
+        assert namespace["User"] is sys.modules["slow_models"].User
+    finally:
+        sys.modules.pop("slow_models", None)
+
+
+def test_pending_value_waits_only_until_ready():
+    ready = Future()
+    value = PendingValue([1, 2, 3], ready, "numbers")
+
+    assert not value.is_loaded
+    assert repr(value) == "<numbers (not ready)>"
+    assert isinstance(value, list)
+    assert unwrap(value) == [1, 2, 3]
+
+    ready.set_result(None)
+
+    assert value.is_loaded
+    assert value.count(2) == 1
+    assert repr(value) == "[1, 2, 3]"
+
+
+def test_pending_value_is_usable_when_setup_failed():
+    failed = Future()
+    failed.set_exception(RuntimeError("no route to host"))
+
+    value = PendingValue({"a": 1}, failed, "mapping")
+
+    assert value.get("a") == 1
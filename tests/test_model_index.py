@@ -0,0 +1,168 @@
+import os
+import sys
+import types
+
+import pytest
+
+from ipython_playground import model_index
+from ipython_playground.lazy import LazyAttribute
+
+
+@pytest.fixture
+def indexed_app(tmp_path, monkeypatch):
+    # Mock SQLModel since it's not installed in the test environment
+    mock_sqlmodel = types.ModuleType("sqlmodel")
+
+    class MockSQLModel:
+        pass
+
+    mock_sqlmodel.SQLModel = MockSQLModel
+    monkeypatch.setitem(sys.modules, "sqlmodel", mock_sqlmodel)
+
+    models_dir = tmp_path / "src" / "indexed_app" / "models"
+    models_dir.mkdir(parents=True)
+    (models_dir.parent / "__init__.py").write_text("")
+    (models_dir / "__init__.py").write_text("")
+    (models_dir / "user.py").write_text(
+        "from enum import Enum\n"
+        "from sqlmodel import SQLModel\n"
+        "class UserStatus(str, Enum):\n    active = 'active'\n"
+        "class User(SQLModel):\n    pass\n"
+    )
+    (models_dir / "order.py").write_text(
+        "from sqlmodel import SQLModel\nclass Order(SQLModel):\n    pass\n"
+    )
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path / "src"))
+
+    yield models_dir
+
+    for name in list(sys.modules):
+        if name == "indexed_app" or name.startswith("indexed_app."):
+            del sys.modules[name]
+
+
+def _forget_app_modules():
+    for name in list(sys.modules):
+        if name.startswith("indexed_app.models"):
+            del sys.modules[name]
+
+
+def test_cold_start_builds_index_from_every_submodule(indexed_app):
+    models = model_index.lazy_sqlmodels("indexed_app.models")
+
+    # order.py was never imported by the package, the index build imports it
+    assert set(models) == {"User", "UserStatus", "Order"}
+    assert isinstance(models["User"], type)
+    assert (model_index.CACHE_DIR / "models-indexed_app.models.json").exists()
+    assert (model_index.CACHE_DIR.parent / ".gitignore").read_text() == "*\n"
+
+
+def test_warm_start_returns_lazy_references(indexed_app):
+    model_index.lazy_sqlmodels("indexed_app.models")
+    _forget_app_modules()
+
+    models = model_index.lazy_sqlmodels("indexed_app.models")
+
+    assert all(isinstance(model, LazyAttribute) for model in models.values())
+    assert "indexed_app.models.order" not in sys.modules
+
+    # only the module defining the model is imported
+    assert models["User"].__name__ == "User"
+    assert "indexed_app.models.user" in sys.modules
+    assert "indexed_app.models.order" not in sys.modules
+
+
+def test_index_survives_touch_but_not_edits(indexed_app):
+    model_index.lazy_sqlmodels("indexed_app.models")
+
+    order_file = indexed_app / "order.py"
+    stat = order_file.stat()
+    os.utime(order_file, (stat.st_atime, stat.st_mtime + 10))
+    assert model_index.load_index("indexed_app.models") is not None
+
+    order_file.write_text(
+        "from sqlmodel import SQLModel\nclass PurchaseOrder(SQLModel):\n    pass\n"
+    )
+    assert model_index.load_index("indexed_app.models") is None
+
+    (indexed_app / "order.py").unlink()
+    model_index.lazy_sqlmodels("indexed_app.models")
+    (indexed_app / "invoice.py").write_text("")
+    assert model_index.load_index("indexed_app.models") is None
+
+
+def test_materialize_referenced_swaps_proxies_for_real_objects():
+    namespace = {
+        "Fraction": LazyAttribute("fractions", "Fraction"),
+        "Decimal": LazyAttribute("decimal", "Decimal"),
+    }
+
+    swapped = model_index.materialize_referenced(namespace, "x = Fraction(1, 3)")
+
+    from fractions import Fraction
+
+    assert swapped == ["Fraction"]
+    assert namespace["Fraction"] is Fraction
+    assert isinstance(namespace["Decimal"], LazyAttribute)
+
+
+def test_warm_start_imports_modules_of_related_models(tmp_path, monkeypatch):
+    orm = pytest.importorskip("sqlalchemy.orm")
+    sa = pytest.importorskip("sqlalchemy")
+
+    # a mapped base stands in for SQLModel, so relationships are configured for real
+    class MockSQLModel(orm.DeclarativeBase):
+        pass
+
+    mock_sqlmodel = types.ModuleType("sqlmodel")
+    mock_sqlmodel.SQLModel = MockSQLModel
+    monkeypatch.setitem(sys.modules, "sqlmodel", mock_sqlmodel)
+
+    models_dir = tmp_path / "src" / "related_app" / "models"
+    models_dir.mkdir(parents=True)
+    (models_dir.parent / "__init__.py").write_text("")
+    (models_dir / "__init__.py").write_text("")
+    (models_dir / "user.py").write_text(
+        "from sqlalchemy.orm import Mapped, mapped_column, relationship\n"
+        "from sqlmodel import SQLModel\n"
+        "class User(SQLModel):\n"
+        "    __tablename__ = 'user'\n"
+        "    id: Mapped[int] = mapped_column(primary_key=True)\n"
+        "    posts = relationship('Post')\n"
+    )
+    (models_dir / "post.py").write_text(
+        "from sqlalchemy import ForeignKey\n"
+        "from sqlalchemy.orm import Mapped, mapped_column\n"
+        "from sqlmodel import SQLModel\n"
+        "class Post(SQLModel):\n"
+        "    __tablename__ = 'post'\n"
+        "    id: Mapped[int] = mapped_column(primary_key=True)\n"
+        "    user_id: Mapped[int] = mapped_column(ForeignKey('user.id'))\n"
+    )
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path / "src"))
+
+    try:
+        model_index.lazy_sqlmodels("related_app.models")
+
+        # a fresh interpreter: no model modules imported, no mappers registered
+        for name in list(sys.modules):
+            if name.startswith("related_app.models."):
+                del sys.modules[name]
+        MockSQLModel.registry.dispose()
+        MockSQLModel.metadata.clear()
+
+        models = model_index.lazy_sqlmodels("related_app.models")
+        namespace = dict(models)
+        model_index.materialize_referenced(namespace, "select(User).join(User.posts)")
+
+        User = namespace["User"]
+        assert "related_app.models.post" in sys.modules
+        assert "JOIN post" in str(sa.select(User).join(User.posts))
+    finally:
+        for name in list(sys.modules):
+            if name == "related_app" or name.startswith("related_app."):
+                del sys.modules[name]
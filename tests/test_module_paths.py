@@ -1,90 +1,79 @@
-import importlib.metadata
 import tempfile
 from pathlib import Path
 from unittest import mock
 
-# We want to test the logic of get_module_info.
-# Since it's a nested function in ipython_playground.output, we'll test the logic here.
-
-
-def get_module_info_logic(module, cwd) -> str:
-    # This matches the implementation in ipython_playground/__init__.py
-    path = ""
-    if hasattr(module, "__path__") and module.__path__:
-        path = module.__path__[0]
-    elif hasattr(module, "__file__"):
-        path = module.__file__
-
-    if path:
-        try:
-            abs_path = Path(path).resolve()
-            if abs_path.is_relative_to(cwd):
-                path = str(abs_path.relative_to(cwd))
-        except (ValueError, OSError):
-            pass
-
-    # Get version
-    v = None
-    pkg_name = module.__name__.split(".")[0]
-    try:
-        v = importlib.metadata.version(pkg_name)
-    except (importlib.metadata.PackageNotFoundError, AttributeError, ValueError):
-        v = getattr(module, "__version__", None)
+import ipython_playground
+from ipython_playground import _distribution_versions, _get_module_info
 
-    if v and v != "unknown version":
-        return f"{module.__name__} ({v}) from {path}"
-    return f"{module.__name__} from {path}"
 
+class MockModule:
+    def __init__(self, name, path=None, version="1.0.0"):
+        self.__name__ = name
+        if path:
+            self.__path__ = [path]
+        self.__version__ = version
 
-def test_get_module_info_relative_paths():
-    """Test that module paths are made relative to current working directory when possible."""
 
-    class MockModule:
-        def __init__(self, name, path=None, version="1.0.0"):
-            self.__name__ = name
-            if path:
-                self.__path__ = [path]
-            self.__version__ = version
+def test_get_module_info_relative_paths(monkeypatch):
+    """Test that module paths are made relative to current working directory when possible."""
 
     with tempfile.TemporaryDirectory() as temp_dir:
         temp_path = Path(temp_dir).resolve()
+        monkeypatch.chdir(temp_path)
 
-        # Create directory structure
+        # resolve() works on non-existent paths too, no need to create the directories
         inside_path = temp_path / "inside" / "module"
-        # We don't actually need to create the directory since we are mocking,
-        # but Path.resolve() might behave differently if it doesn't exist?
-        # Actually resolve() works on non-existent paths too.
-
         outside_path = Path("/tmp/outside_module").resolve()
 
-        # Test inside module (should be relative)
-        module_inside = MockModule("test_inside", str(inside_path))
-        with mock.patch(
-            "importlib.metadata.version",
-            side_effect=importlib.metadata.PackageNotFoundError,
+        with mock.patch.object(
+            ipython_playground, "_distribution_versions", return_value={}
         ):
-            result = get_module_info_logic(module_inside, temp_path)
+            # Test inside module (should be relative)
+            module_inside = MockModule("test_inside", str(inside_path))
+            result = _get_module_info(module_inside)
             assert result == "test_inside (1.0.0) from inside/module"
 
-        # Test outside module (should remain absolute)
-        module_outside = MockModule("test_outside", str(outside_path))
-        with mock.patch(
-            "importlib.metadata.version",
-            side_effect=importlib.metadata.PackageNotFoundError,
-        ):
-            result = get_module_info_logic(module_outside, temp_path)
+            # Test outside module (should remain absolute)
+            module_outside = MockModule("test_outside", str(outside_path))
+            result = _get_module_info(module_outside)
             assert result == f"test_outside (1.0.0) from {outside_path}"
 
 
 def test_get_module_info_no_path():
-    class MockModule:
+    class PathlessModule:
         def __init__(self, name):
             self.__name__ = name
 
-    module = MockModule("test_no_path")
-    with mock.patch(
-        "importlib.metadata.version",
-        side_effect=importlib.metadata.PackageNotFoundError,
+    module = PathlessModule("test_no_path")
+    with mock.patch.object(
+        ipython_playground, "_distribution_versions", return_value={}
     ):
-        result = get_module_info_logic(module, Path.cwd())
+        result = _get_module_info(module)
         assert result == "test_no_path from "
+
+
+def test_distribution_versions_maps_import_names():
+    dist = mock.Mock(metadata={"Name": "Fake.Dist"}, version="2.3.4")
+    shadowed = mock.Mock(metadata={"Name": "fake-dist"}, version="0.0.1")
+
+    _distribution_versions.cache_clear()
+    try:
+        with (
+            mock.patch(
+                "importlib.metadata.distributions", return_value=[dist, shadowed]
+            ) as distributions,
+            mock.patch(
+                "importlib.metadata.packages_distributions",
+                return_value={"fake_import": ["Fake_Dist"]},
+            ),
+        ):
+            assert _distribution_versions() == {"fake_import": "2.3.4"}
+
+            module = MockModule("fake_import.submodule", version=None)
+            assert _get_module_info(module) == "fake_import.submodule (2.3.4) from "
+
+            # the index is built once per session
+            _distribution_versions()
+            assert distributions.call_count == 1
+    finally:
+        _distribution_versions.cache_clear()
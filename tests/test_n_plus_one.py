@@ -0,0 +1,117 @@
+import pytest
+
+from ipython_playground.n_plus_one import NPlusOneDetector, normalize_sql
+
+sa = pytest.importorskip("sqlalchemy")
+orm = pytest.importorskip("sqlalchemy.orm")
+
+
+class Base(orm.DeclarativeBase):
+    pass
+
+
+class Author(Base):
+    __tablename__ = "author"
+
+    id: orm.Mapped[int] = orm.mapped_column(primary_key=True)
+    books: orm.Mapped[list["Book"]] = orm.relationship(back_populates="author")
+
+
+class Book(Base):
+    __tablename__ = "book"
+
+    id: orm.Mapped[int] = orm.mapped_column(primary_key=True)
+    author_id: orm.Mapped[int] = orm.mapped_column(sa.ForeignKey("author.id"))
+    author: orm.Mapped[Author] = orm.relationship(back_populates="books")
+
+
+@pytest.fixture
+def session():
+    engine = sa.create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+
+    with orm.Session(engine) as session:
+        session.add_all([Author(id=i, books=[Book(), Book()]) for i in range(5)])
+        session.commit()
+        yield session
+
+    engine.dispose()
+
+
+@pytest.fixture
+def detector(session):
+    detector = NPlusOneDetector(threshold=3)
+    detector.attach(session.get_bind())
+    return detector
+
+
+def test_normalize_sql():
+    assert normalize_sql("SELECT * FROM t WHERE id = 5 AND name = 'x'") == (
+        "SELECT * FROM t WHERE id = ? AND name = ?"
+    )
+    assert normalize_sql("select *\n  from t where id in (?, ?, ?)") == (
+        "select * from t where id in (?)"
+    )
+    assert normalize_sql("select * from t where id = %(id_1)s") == (
+        "select * from t where id = ?"
+    )
+    assert normalize_sql("select * from t where id = $1 and x::int = :x") == (
+        "select * from t where id = ? and x::int = ?"
+    )
+
+
+def test_one_to_many_lazy_load_suggests_selectinload(session, detector, caplog):
+    for author in session.scalars(sa.select(Author)):
+        assert author.books
+
+    (repeated,) = detector.repeated.values()
+    assert repeated.count == 5
+    assert repeated.relationship == "Author.books"
+    assert repeated.suggestion == "select(Author).options(selectinload(Author.books))"
+    assert repeated.call_site is not None
+    assert __file__ in repeated.call_site
+    assert "Query ran 4 times in this cell" in caplog.text
+
+
+def test_many_to_one_lazy_load_suggests_joinedload(session, detector):
+    session.expunge_all()
+    for book in session.scalars(sa.select(Book)):
+        assert book.author
+
+    (repeated,) = detector.repeated.values()
+    assert repeated.suggestion == "select(Book).options(joinedload(Book.author))"
+
+
+def test_eager_loading_is_not_reported(session, detector):
+    authors = session.scalars(sa.select(Author).options(orm.selectinload(Author.books)))
+    for author in authors:
+        assert author.books
+
+    assert detector.repeated == {}
+
+
+def test_repeated_plain_queries_are_reported_without_suggestion(session, detector):
+    for i in range(4):
+        session.execute(sa.text(f"select * from book where id = {i}")).all()
+
+    (repeated,) = detector.repeated.values()
+    assert repeated.shape == "select * from book where id = ?"
+    assert repeated.suggestion is None
+
+
+def test_reset_starts_over(session, detector):
+    for i in range(3):
+        session.execute(sa.text(f"select {i}"))
+    detector.reset()
+    session.execute(sa.text("select 4"))
+
+    assert detector.counts["select ?"] == 1
+    assert detector.repeated == {}
+
+
+def test_detach(session, detector):
+    detector.attach(session.get_bind())
+    detector.detach(session.get_bind())
+    session.execute(sa.text("select 1"))
+
+    assert detector.counts == {}
@@ -0,0 +1,113 @@
+import json
+import re
+
+import pytest
+
+import ipython_playground
+from ipython_playground.lazy import LazyAttribute
+from ipython_playground.namespace import (
+    classify_namespace,
+    diff_snapshots,
+    take_snapshot,
+)
+
+
+class User:
+    pass
+
+
+class UserProfile:
+    pass
+
+
+class Order:
+    pass
+
+
+def helper(x: int) -> int:
+    return x
+
+
+def test_classify_namespace_single_pass():
+    index = classify_namespace(
+        {
+            "User": User,
+            "Order": Order,
+            "helper": helper,
+            "re": re,
+            "json": json,
+            "count": 3,
+            "_private": 1,
+            "Out": {},
+            "lazy_thing": LazyAttribute("fractions", "Fraction"),
+        }
+    )
+
+    assert list(index.classes) == ["User", "Order"]
+    assert list(index.functions) == ["helper"]
+    # json is in the builtin module exclusion list
+    assert list(index.modules) == ["re"]
+    assert list(index.variables) == ["count", "lazy_thing"]
+
+
+def test_namespace_index_filter():
+    index = classify_namespace(
+        {"User": User, "UserProfile": UserProfile, "Order": Order, "helper": helper}
+    )
+
+    filtered = index.filter(kinds=["classes"], pattern="User*")
+    assert list(filtered.classes) == ["User", "UserProfile"]
+    assert filtered.functions == {}
+
+    assert list(index.filter(pattern=re.compile("der$")).classes) == ["Order"]
+    assert len(index.filter(limit=1).classes) == 1
+
+    with pytest.raises(ValueError):
+        index.filter(kinds=["widgets"])
+
+
+def test_output_filters_sections(capsys):
+    # output() reads the caller's globals, which is this test module
+    ipython_playground.output(kinds=["classes"], pattern="User*")
+
+    out = capsys.readouterr().out
+    assert "UserProfile" in out
+    assert "Order" not in out
+    assert "Custom Functions" not in out
+
+
+def test_snapshot_diff_tracks_added_removed_and_rebound():
+    values = {"kept": [1], "rebound": [2], "removed": {}, "Helper": User}
+    before = take_snapshot(values, classify_namespace(values))
+
+    values["rebound"] = [2]
+    del values["removed"]
+    values["added"] = 3
+    after = take_snapshot(values, classify_namespace(values))
+
+    changes = diff_snapshots(before, after)
+    assert changes.added == {"added"}
+    assert changes.removed == {"removed": "dict"}
+    assert changes.rebound == {"rebound"}
+
+
+def test_output_since_last(capsys):
+    module_globals = globals()
+    module_globals["short_lived"] = 1
+
+    ipython_playground.output()
+    capsys.readouterr()
+
+    del module_globals["short_lived"]
+    module_globals["fresh_value"] = [1, 2, 3]
+
+    try:
+        ipython_playground.output(since_last=True)
+        out = capsys.readouterr().out
+        assert "fresh_value" in out
+        assert "Removed Since Last output()" in out
+        assert "short_lived" in out
+        # unchanged names are left out
+        assert "UserProfile" not in out
+    finally:
+        del module_globals["fresh_value"]
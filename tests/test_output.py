@@ -0,0 +1,43 @@
+import contextlib
+import io
+from unittest import mock
+
+from rich.console import Console
+
+import ipython_playground
+
+
+class Widget:
+    "a class row for the report"
+
+
+def test_output_writes_report_in_one_print(capsys):
+    with mock.patch.object(Console, "print", autospec=True) as console_print:
+        ipython_playground.output()
+
+    assert console_print.call_count == 1
+
+    # output() reads the caller's globals, so this module's class is rendered too
+    rendered = io.StringIO()
+    Console(file=rendered, width=120).print(*console_print.call_args.args[1:])
+    assert "Widget" in rendered.getvalue()
+
+
+def test_output_pages_tall_reports(monkeypatch):
+    monkeypatch.setenv("LINES", "5")
+    pagers = []
+
+    @contextlib.contextmanager
+    def fake_pager(self, *args, **kwargs):
+        pagers.append(kwargs)
+        yield
+
+    with (
+        mock.patch.object(Console, "pager", fake_pager),
+        mock.patch.object(Console, "print", autospec=True),
+    ):
+        ipython_playground.output()
+        assert pagers == []
+
+        ipython_playground.output(pager=True)
+        assert pagers == [{"styles": True}]
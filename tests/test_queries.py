@@ -0,0 +1,141 @@
+import pytest
+
+from ipython_playground import queries
+from ipython_playground.database import run_statement, stream_statement
+from ipython_playground.queries import QueryRecord, QueryRecorder
+
+sa = pytest.importorskip("sqlalchemy")
+
+
+@pytest.fixture
+def engine():
+    engine = sa.create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(sa.text("create table numbers (value integer)"))
+
+    yield engine
+    engine.dispose()
+
+
+def test_records_statements(engine):
+    recorder = QueryRecorder()
+    recorder.attach(engine)
+
+    with engine.begin() as connection:
+        connection.execute(sa.text("insert into numbers values (:value)"), {"value": 1})
+        connection.execute(sa.text("select value from numbers")).all()
+
+    statements = [record.statement for record in recorder.records]
+    assert statements == [
+        "insert into numbers values (?)",
+        "select value from numbers",
+    ]
+    assert recorder.records[0].parameters == (1,)
+    assert recorder.records[0].rowcount == 1
+    assert all(record.duration >= 0 for record in recorder.records)
+
+
+def test_executemany_keeps_first_parameter_set(engine):
+    recorder = QueryRecorder()
+    recorder.attach(engine)
+
+    with engine.begin() as connection:
+        connection.execute(
+            sa.text("insert into numbers values (:value)"),
+            [{"value": i} for i in range(50)],
+        )
+
+    (record,) = recorder.records
+    assert record.parameter_sets == 50
+    assert record.parameters == (0,)
+
+
+def test_selects_record_rows_fetched(engine, monkeypatch):
+    orm = pytest.importorskip("sqlalchemy.orm")
+
+    recorder = QueryRecorder()
+    recorder.attach(engine)
+    monkeypatch.setattr(queries, "recorder", recorder)
+
+    with engine.begin() as connection:
+        connection.execute(
+            sa.text("insert into numbers values (:value)"),
+            [{"value": i} for i in range(30)],
+        )
+
+    stmt = sa.text("select value from numbers")
+    with orm.Session(engine) as session:
+        run_statement(session, stmt, max_rows=None)
+        run_statement(session, stmt, max_rows=10)
+        sum(1 for _ in stream_statement(session, stmt, chunk_size=7))
+        # the driver doesn't know, and the rows weren't fetched through the playground
+        session.execute(stmt).all()
+
+    # SQLite reports -1 rows for every SELECT, the counts are what was fetched
+    selects = [r.rowcount for r in recorder.records if r.statement.startswith("select")]
+    assert selects == [30, 11, 30, None]
+
+
+def test_ring_buffer_is_bounded(engine):
+    recorder = QueryRecorder(capacity=3)
+    recorder.attach(engine)
+
+    with engine.connect() as connection:
+        for i in range(10):
+            connection.execute(sa.text(f"select {i}"))
+
+    assert [record.statement for record in recorder.records] == [
+        "select 7",
+        "select 8",
+        "select 9",
+    ]
+
+
+def test_slowest_orders_by_duration():
+    recorder = QueryRecorder()
+    for statement, duration in [("fast", 0.001), ("slow", 0.5), ("medium", 0.01)]:
+        recorder.records.append(_record(statement, duration))
+
+    assert [record.statement for record in recorder.slowest(2)] == ["slow", "medium"]
+
+
+def test_echo_can_be_toggled(engine, caplog):
+    recorder = QueryRecorder()
+    recorder.attach(engine)
+
+    with engine.connect() as connection:
+        connection.execute(sa.text("select 'quiet'"))
+        recorder.echo = True
+        connection.execute(sa.text("select 'loud'"))
+
+    assert "loud" in caplog.text
+    assert "quiet" not in caplog.text
+
+
+def test_failed_statements_do_not_leak_start_times(engine):
+    recorder = QueryRecorder()
+    recorder.attach(engine)
+
+    with engine.connect() as connection:
+        with pytest.raises(sa.exc.OperationalError):
+            connection.execute(sa.text("select * from missing"))
+
+        connection.execute(sa.text("select 1"))
+        assert not connection.info["ipython_playground_query_start"]
+
+
+def test_attach_twice_and_detach(engine):
+    recorder = QueryRecorder()
+    recorder.attach(engine)
+    recorder.attach(engine)
+
+    with engine.connect() as connection:
+        connection.execute(sa.text("select 1"))
+        recorder.detach(engine)
+        connection.execute(sa.text("select 2"))
+
+    assert [record.statement for record in recorder.records] == ["select 1"]
+
+
+def _record(statement, duration):
+    return QueryRecord(statement, None, 1, duration, None)
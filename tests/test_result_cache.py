@@ -0,0 +1,137 @@
+import pytest
+
+from ipython_playground import result_cache
+from ipython_playground.database import cached_run_statement
+from ipython_playground.result_cache import ResultCache
+
+sa = pytest.importorskip("sqlalchemy")
+
+# the table of the `session` fixture
+numbers = sa.table("numbers", sa.column("value"))
+
+
+def count_above(session, cache, minimum):
+    stmt = sa.select(sa.func.count()).where(numbers.c.value > minimum)
+    rows = cached_run_statement(cache, session, stmt)
+    return rows[0][0]
+
+
+def test_repeated_statement_is_served_from_the_cache(session):
+    cache = ResultCache()
+
+    assert count_above(session, cache, 245) == 4
+    session.execute(sa.text("delete from numbers"))
+
+    assert count_above(session, cache, 245) == 4
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_writes_are_never_cached(session):
+    cache = ResultCache()
+    insert = numbers.insert().values(value=1_000).returning(numbers.c.value)
+
+    cached_run_statement(cache, session, insert)
+    cached_run_statement(cache, session, insert)
+
+    assert count_above(session, cache, 999) == 2
+    assert cache.stats()["entries"] == 1
+
+
+def test_text_is_only_cached_when_asked(session):
+    cache = ResultCache()
+    stmt = sa.text("select count(*) from numbers")
+
+    cached_run_statement(cache, session, stmt)
+    assert cache.misses == 0
+
+    cached_run_statement(cache, session, stmt, cache_text=True)
+    cached_run_statement(cache, session, stmt, cache_text=True)
+    assert cache.hits == 1
+
+
+def test_results_are_copies(session):
+    cache = ResultCache()
+    stmt = sa.select(numbers.c.value).order_by(numbers.c.value)
+
+    cached_run_statement(cache, session, stmt).clear()
+    rows = cached_run_statement(cache, session, stmt)
+    rows.append("junk")
+
+    assert len(cached_run_statement(cache, session, stmt)) == 250
+
+
+def test_parameters_are_part_of_the_key(session):
+    cache = ResultCache()
+
+    assert count_above(session, cache, 245) == 4
+    assert count_above(session, cache, 247) == 2
+    assert cache.misses == 2
+
+
+def test_entries_expire(session, monkeypatch):
+    cache = ResultCache(ttl=60)
+    now = 1_000_000.0
+    monkeypatch.setattr(result_cache.time, "time", lambda: now)
+
+    count_above(session, cache, 245)
+    now += 61
+    count_above(session, cache, 245)
+
+    assert cache.hits == 0
+    assert cache.misses == 2
+
+
+def test_least_recently_used_entry_is_evicted(session):
+    cache = ResultCache(max_entries=2)
+
+    count_above(session, cache, 1)
+    count_above(session, cache, 2)
+    count_above(session, cache, 1)
+    count_above(session, cache, 3)
+
+    assert cache.evictions == 1
+    count_above(session, cache, 1)
+    assert cache.hits == 2
+    count_above(session, cache, 2)
+    assert cache.misses == 4
+
+
+def test_byte_bound(session):
+    cache = ResultCache(max_bytes=1)
+
+    count_above(session, cache, 1)
+
+    assert cache.stats()["entries"] == 0
+
+
+def test_spilled_results_survive_a_new_cache(session, tmp_path):
+    spill_dir = tmp_path / "cache" / "results"
+    count_above(session, ResultCache(spill=True, spill_dir=spill_dir), 245)
+    session.execute(sa.text("delete from numbers"))
+
+    cache = ResultCache(spill=True, spill_dir=spill_dir)
+
+    assert count_above(session, cache, 245) == 4
+    assert cache.disk_hits == 1
+
+
+def test_invalidate_by_table_name(session, tmp_path):
+    spill_dir = tmp_path / "results"
+    count_above(session, ResultCache(spill=True, spill_dir=spill_dir), 245)
+
+    cache = ResultCache(spill=True, spill_dir=spill_dir)
+    count_above(session, cache, 247)
+
+    assert cache.invalidate("other_table") == 0
+    assert cache.invalidate("numbers") == 2
+    assert list(spill_dir.iterdir()) == []
+
+
+def test_configure():
+    try:
+        assert isinstance(result_cache.configure({"ttl": 5}), ResultCache)
+        assert result_cache.cache.ttl == 5
+        assert result_cache.configure(False) is None
+    finally:
+        result_cache.cache = None
@@ -0,0 +1,81 @@
+import pytest
+
+from ipython_playground.engines import dispose_engine
+from ipython_playground.shards import run_on_shards
+
+sa = pytest.importorskip("sqlalchemy")
+
+
+@pytest.fixture
+def shards(tmp_path):
+    urls = {}
+    for shard, rows in [("a", 3), ("b", 2), ("c", 4)]:
+        url = f"sqlite:///{tmp_path / f'{shard}.db'}"
+        engine = sa.create_engine(url)
+        with engine.begin() as connection:
+            connection.execute(sa.text("create table users (id integer)"))
+            connection.execute(
+                sa.text("insert into users values (:id)"),
+                [{"id": i} for i in range(rows)],
+            )
+        engine.dispose()
+        urls[shard] = url
+
+    yield urls
+    dispose_engine()
+
+
+def test_rows_are_tagged_and_merged_in_shard_order(shards):
+    results = run_on_shards(shards, sa.text("select count(*) as total from users"))
+
+    assert results.ok
+    assert [(row.shard, row.total) for row in results] == [
+        ("a", 3),
+        ("b", 2),
+        ("c", 4),
+    ]
+    assert set(results.durations) == {"a", "b", "c"}
+
+
+def test_list_of_urls_is_named_after_the_url(shards):
+    results = run_on_shards(list(shards.values()), sa.text("select 1 as one"))
+
+    assert [row.shard for row in results] == list(shards.values())
+
+
+def test_partial_failure_is_reported(shards, tmp_path, caplog):
+    shards["broken"] = f"sqlite:///{tmp_path / 'missing' / 'broken.db'}"
+
+    results = run_on_shards(shards, sa.text("select id from users"), workers=2)
+
+    assert not results.ok
+    assert list(results.errors) == ["broken"]
+    assert len(results) == 9
+    assert "1 of 4 shards failed: broken" in caplog.text
+
+
+def test_max_rows_applies_per_shard(shards):
+    results = run_on_shards(shards, sa.text("select id from users"), max_rows=2)
+
+    assert [row.shard for row in results] == ["a", "a", "b", "b", "c", "c"]
+
+
+def test_to_records(shards):
+    results = run_on_shards({"a": shards["a"]}, sa.text("select id from users"))
+
+    assert results.to_records() == [
+        {"shard": "a", "id": 0},
+        {"shard": "a", "id": 1},
+        {"shard": "a", "id": 2},
+    ]
+
+
+def test_rows_forward_columns_that_shadow_tuple_methods(shards):
+    results = run_on_shards({"a": shards["a"]}, sa.text("select 42 as count, 7 as id"))
+
+    (row,) = results
+    assert row.shard == "a"
+    assert row.count == 42
+    assert row[0] == 42
+    assert tuple(row) == (42, 7)
+    assert len(row) == 2
@@ -69,3 +69,43 @@ def test_format_signature_builtin():
     # Builtins might raise TypeError in inspect.signature, which we handle by returning ""
     sig = _format_signature(int)
     assert sig == "" or sig.startswith("(")
+
+
+def test_format_signature_cache_invalidated_on_code_change():
+    from ipython_playground import _format_return_type, _signature_cache
+
+    def reloaded(a: int) -> int:
+        return a
+
+    def replacement(a: int, b: int) -> str:
+        return str(a + b)
+
+    assert _format_signature(reloaded) == "(a: int) -> int"
+    assert _format_return_type(reloaded) == "int"
+    assert reloaded in _signature_cache
+
+    # reloading a module with a patched function swaps __code__ on the same function object
+    reloaded.__code__ = replacement.__code__
+    reloaded.__annotations__ = replacement.__annotations__
+
+    assert _format_signature(reloaded) == "(a: int, b: int) -> str"
+    assert _format_return_type(reloaded) == "str"
+
+
+def test_format_signature_cache_does_not_keep_objects_alive():
+    import gc
+    import weakref
+
+    from ipython_playground import _signature_cache
+
+    class Temporary:
+        def __init__(self, value: int):
+            self.value = value
+
+    assert _format_signature(Temporary) == "(self, value: int)"
+    assert Temporary in _signature_cache
+    temporary_ref = weakref.ref(Temporary)
+
+    del Temporary
+    gc.collect()
+    assert temporary_ref() is None
@@ -0,0 +1,75 @@
+import sys
+
+import ipython_playground
+from ipython_playground.sizing import deep_sizeof, format_size, size_all
+
+
+class Holder:
+    def __init__(self, payload):
+        self.payload = payload
+
+
+def test_deep_sizeof_follows_references():
+    payload = b"x" * 10_000
+    estimate = deep_sizeof(Holder([payload]))
+
+    assert estimate.bytes > 10_000
+    assert not estimate.approximate
+
+
+def test_deep_sizeof_counts_shared_objects_once():
+    payload = b"x" * 10_000
+    estimate = deep_sizeof([payload, payload, payload])
+
+    assert estimate.bytes < 20_000
+
+
+def test_deep_sizeof_samples_large_containers():
+    items = [bytes(1_000) for _ in range(10_000)]
+    estimate = deep_sizeof(items, sample_size=100)
+
+    assert estimate.approximate
+    # extrapolated from 100 samples, should land close to the real total
+    assert 9_000_000 < estimate.bytes < 12_000_000
+
+
+def test_deep_sizeof_respects_depth():
+    nested: list = []
+    current = nested
+    for _ in range(50):
+        current.append([])
+        current = current[0]
+
+    estimate = deep_sizeof(nested, max_depth=5)
+    assert estimate.approximate
+    assert estimate.bytes < sys.getsizeof([]) * 10
+
+
+def test_deep_sizeof_buffers():
+    buffer = memoryview(bytearray(50_000))
+    assert deep_sizeof(buffer).bytes >= 50_000
+
+
+def test_size_all_falls_back_to_shallow_sizes():
+    sizes = size_all({"a": [1, 2, 3], "b": {"x": "y"}}, budget=0)
+
+    assert sizes["a"].approximate
+    assert sizes["a"].bytes == sys.getsizeof([1, 2, 3])
+
+
+def test_format_size():
+    assert format_size(512) == "512 B"
+    assert format_size(3 * 1024**3) == "3.0 GB"
+
+
+big_variable = [bytes(1_000) for _ in range(1_000)]
+small_variable = 1
+
+
+def test_output_sorts_variables_by_size(capsys):
+    ipython_playground.output(kinds=["variables"], sort="size", limit=1)
+    out = capsys.readouterr().out
+
+    assert "big_variable" in out
+    assert "small_variable" not in out
+    assert "MB" in out or "KB" in out
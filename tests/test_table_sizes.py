@@ -0,0 +1,105 @@
+import pytest
+
+import ipython_playground
+from ipython_playground import table_sizes
+from ipython_playground.table_sizes import TableSize, model_tables
+
+sa = pytest.importorskip("sqlalchemy")
+orm = pytest.importorskip("sqlalchemy.orm")
+
+
+class Base(orm.DeclarativeBase):
+    pass
+
+
+class Order(Base):
+    __tablename__ = "orders"
+
+    id: orm.Mapped[int] = orm.mapped_column(primary_key=True)
+    status: orm.Mapped[str] = orm.mapped_column(index=True)
+
+
+class Country(Base):
+    __tablename__ = "countries"
+
+    id: orm.Mapped[int] = orm.mapped_column(primary_key=True)
+
+
+class Note(Base):
+    __tablename__ = "notes"
+
+    id: orm.Mapped[int] = orm.mapped_column(primary_key=True)
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(table_sizes, "LARGE_TABLE_ROWS", 100)
+
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'playground.db'}")
+    Base.metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        connection.execute(
+            Order.__table__.insert(), [{"status": "open"} for _ in range(250)]
+        )
+        connection.execute(Country.__table__.insert(), [{} for _ in range(3)])
+
+    yield engine
+    engine.dispose()
+
+
+def analyze(engine):
+    with engine.begin() as connection:
+        connection.exec_driver_sql("analyze")
+
+
+def test_sizes_come_from_a_single_catalog_query(engine):
+    analyze(engine)
+
+    statements = []
+    sa.event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+
+    sizes = table_sizes.table_sizes(engine, [Note, Country, Order])
+
+    assert [(size.name, size.rows) for size in sizes] == [
+        ("orders", 250),
+        ("countries", 3),
+        # empty tables get no statistics
+        ("notes", None),
+    ]
+    assert sizes[0].large
+    assert not sizes[1].large
+    assert len(statements) == 1
+    assert "count(" not in statements[0].lower()
+
+
+def test_unanalyzed_sqlite_database(engine):
+    sizes = table_sizes.table_sizes(engine, ["orders"])
+
+    assert sizes == [TableSize("orders", None, None)]
+    assert str(sizes[0]) == "not analyzed"
+
+
+def test_table_size_str():
+    assert str(TableSize("orders", 1_234_567, 3 * 1024**2)) == "~1,234,567 rows, 3.0 MB"
+
+
+def test_model_tables_skips_unmapped_classes():
+    assert model_tables([Order, Base, int, "orders"]) == [Order.__table__]
+
+
+def test_output_table_sizes_section(engine, capsys):
+    analyze(engine)
+
+    # output() reads the caller's globals, which is this test module
+    globals()["engine"] = engine
+    try:
+        ipython_playground.output(kinds=["classes"], table_sizes=True)
+    finally:
+        del globals()["engine"]
+
+    out = capsys.readouterr().out
+    assert "Table Sizes" in out
+    assert "~250 rows" in out
@@ -0,0 +1,48 @@
+import sys
+
+import ipython_playground
+from ipython_playground import timing
+from ipython_playground.extras import load_modules_for_ipython
+
+
+def test_timed_attributes_nested_imports(tmp_path):
+    (tmp_path / "timed_parent_module.py").write_text("import timed_child_module\n")
+    (tmp_path / "timed_child_module.py").write_text("VALUE = 1\n")
+    sys.path.insert(0, str(tmp_path))
+    timing.timings.clear()
+
+    try:
+        load_modules_for_ipython(
+            [{"module": "timed_parent_module"}, {"module": "a_missing_timed_module"}]
+        )
+
+        records = {record.name: record for record in timing.timings}
+        parent = records["import timed_parent_module"]
+        assert parent.kind == "import"
+        assert parent.imports == 2
+        assert parent.wall >= 0 and parent.cpu >= 0
+
+        # failed imports are timed but don't count as imported modules
+        assert records["import a_missing_timed_module"].imports == 0
+    finally:
+        sys.path.remove(str(tmp_path))
+        timing.timings.clear()
+        for name in ["timed_parent_module", "timed_child_module"]:
+            sys.modules.pop(name, None)
+
+
+def test_output_startup_profile(capsys):
+    timing.timings.clear()
+    timing.timings.append(timing.Timing("find_all_sqlmodels", "stage", 1.5, 1.2, 42))
+
+    try:
+        ipython_playground.output()
+        assert "Startup Profile" not in capsys.readouterr().out
+
+        ipython_playground.output(profile=True)
+        out = capsys.readouterr().out
+        assert "Startup Profile" in out
+        assert "find_all_sqlmodels" in out
+        assert "1500.0ms wall" in out
+    finally:
+        timing.timings.clear()